@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+from game_log import log_files, parse_game, results as result_values
+from rules import CELLS, PIECE_NAMES, starting_position, move_from_iccf
+
+
+result_tokens = {value: token for token, value in result_values.items()}
+
+
+class CorpusStats:
+    """
+
+    Statistics over a set of games. Partial statistics from different processes are combined with merge.
+
+    """
+
+    def __init__(self, opening_plies=4):
+        self.opening_plies = opening_plies
+        self.games = 0
+        self.results = Counter()
+        self.lengths = Counter()
+        self.openings = Counter()
+        self.captures = 0
+        self.promotions = 0
+        self.plies = 0
+        self.occupancy = np.zeros((15, 91), dtype=np.int64)  # Positions with each piece code on each cell
+
+    def add_game(self, moves: list[str], result: float | None):
+        position = starting_position()
+        snapshots = bytearray()
+
+        for notation in moves:
+            move = move_from_iccf(notation)
+            if position.apply(move):
+                self.captures += 1
+            if move[2]:
+                self.promotions += 1
+            snapshots += position.cells
+
+        if result is None:
+            result = position.result()
+
+        self.games += 1
+        self.plies += len(moves)
+        self.results[result_tokens.get(result, "unfinished")] += 1
+        self.lengths[len(moves)] += 1
+        if len(moves) >= self.opening_plies:
+            self.openings[" ".join(moves[:self.opening_plies])] += 1
+
+        if snapshots:
+            codes = np.frombuffer(bytes(snapshots), dtype=np.uint8).reshape(-1, 91).astype(np.int64)
+            self.occupancy += np.bincount((codes * 91 + np.arange(91)).ravel(), minlength=15 * 91).reshape(15, 91)
+
+    def merge(self, other):
+        self.games += other.games
+        self.results += other.results
+        self.lengths += other.lengths
+        self.openings += other.openings
+        self.captures += other.captures
+        self.promotions += other.promotions
+        self.plies += other.plies
+        self.occupancy += other.occupancy
+
+    def to_dict(self, top_openings=20) -> dict:
+        positions = max(self.plies, 1)
+        return {
+            "games": self.games,
+            "results": dict(self.results),
+            "length": {
+                "mean": self.plies / max(self.games, 1),
+                "histogram": {str(length): count for length, count in sorted(self.lengths.items())}
+            },
+            "openings": dict(self.openings.most_common(top_openings)),
+            "captures_per_game": self.captures / max(self.games, 1),
+            "capture_rate": self.captures / positions,
+            "promotions_per_game": self.promotions / max(self.games, 1),
+            "occupancy": {
+                ("white " if code >> 3 else "black ") + PIECE_NAMES[code & 7]:
+                    {CELLS[cell]: round(float(self.occupancy[code, cell]) / positions, 5) for cell in range(91)}
+                for code in range(1, 15) if code & 7 in PIECE_NAMES
+            }
+        }
+
+
+def analyze_chunk(task: (list[str], int)) -> CorpusStats:
+    lines, opening_plies = task
+    stats = CorpusStats(opening_plies)
+
+    for line in lines:
+        moves, result = parse_game(line)
+        if moves:
+            stats.add_game(moves, result)
+
+    return stats
+
+
+def iter_chunks(paths: list[str], chunk_size: int, opening_plies: int):
+    for file_name in log_files(paths):
+        with open(file_name, 'r') as file:
+            while chunk := list(islice(file, chunk_size)):
+                yield chunk, opening_plies
+
+
+def occupancy_map(stats: CorpusStats) -> str:
+    # Share of positions in which each cell is occupied, one line per file from a to k
+    occupied = stats.occupancy[1:].sum(axis=0) / max(stats.plies, 1)
+    lines = []
+    for file_index in range(11):
+        cells = [cell for cell in range(91) if CELLS[cell][0] == chr(file_index + 97)]
+        lines.append(chr(file_index + 97) + ": " + " ".join(f"{occupied[cell]:.2f}" for cell in cells))
+
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregates statistics over a directory of game logs")
+    parser.add_argument("logs", nargs="+", help="Game log files or directories")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Games per task")
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--json", default=None, help="File to write the full statistics to")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    stats = CorpusStats(args.opening_plies)
+
+    chunks = iter_chunks(args.logs, args.chunk_size, args.opening_plies)
+    with Pool(args.processes) as pool:
+        # Only a few chunks per process are read ahead, so memory stays flat however many logs there are
+        while tasks := list(islice(chunks, args.processes * 2)):
+            for partial in pool.imap_unordered(analyze_chunk, tasks):
+                stats.merge(partial)
+
+    summary = stats.to_dict()
+    print(f"Games: {stats.games} in {time.time() - start_time:.1f}s")
+    print(f"Results: {summary['results']}")
+    print(f"Mean length: {summary['length']['mean']:.1f} plies")
+    print(f"Captures per game: {summary['captures_per_game']:.2f}, per ply: {summary['capture_rate']:.3f}")
+    print(f"Promotions per game: {summary['promotions_per_game']:.3f}")
+    print("Most common openings:")
+    for opening, count in list(summary["openings"].items())[:10]:
+        print(f"  {opening}: {count}")
+    print("Cell occupancy:")
+    print(occupancy_map(stats))
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-from utilities import position_to_file_and_rank
 from math import sqrt
 
 
@@ -29,6 +28,37 @@ def pixel_to_axial(board, point: (float, float)) -> Axial:
     return axial_round((q, r))
 
 
+def pixels_to_axials(board, points):
+    """
+
+    Vectorized pixel_to_axial, for converting many points at once
+
+    :param board: The board the points are on
+    :param points: Array of shape (n, 2) of x and y
+    :return: Integer numpy array of shape (n, 2) of q and r
+    """
+
+    import numpy as np  # Only needed here, so importing axial (and rules with it) does not load numpy
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    x = points[:, 0] - board.center[0]
+    y = points[:, 1] - board.center[1]
+    q = (2 / 3 * x) / (50 * board.scale)
+    r = (-1 / 3 * x + sqrt(3) / 3 * y) / (50 * board.scale)
+
+    # Same rounding as axial_round
+    q_grid = np.round(q)
+    r_grid = np.round(r)
+    q -= q_grid
+    r -= r_grid
+
+    round_q = np.abs(q) >= np.abs(r)
+    q_grid += np.where(round_q, np.round(q + 0.5 * r), 0)
+    r_grid += np.where(round_q, 0, np.round(r + 0.5 * q))
+
+    return np.stack((q_grid, r_grid), axis=1).astype(np.int64)
+
+
 def axial_round(point: (float, float)) -> Axial:
     x, y = point
     x_grid = round(x)
@@ -50,3 +80,10 @@ def position_to_axial(position: str) -> Axial:
     y = 6 - rank if file_index < 6 else 6 - (file_index - 5) - rank
 
     return Axial(x, y)
+
+
+def position_to_file_and_rank(position: str) -> (int, int):
+    file = position[0]
+    file_index = ord(file) - 97
+    rank = int(position[1:])
+    return file_index, rank
@@ -0,0 +1,27 @@
+import os
+
+# Baking needs no window, so this has to be set before pygame is first imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import pygame
+from board import get_piece_scale
+from utilities import save_sprite_bundle, bundle_path, sprite_size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-scales the piece sprites for window sizes into sprite bundles")
+    parser.add_argument("widths", nargs="*", type=int, default=[600, 700, 800], help="Window widths to bake for")
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))  # Sprites are converted to the display format, so one has to exist
+
+    for width in args.widths:
+        sprite_scale = get_piece_scale((width, width))
+        save_sprite_bundle(sprite_scale)
+        print(f"{width}: {bundle_path(sprite_size(sprite_scale))}")
+
+
+if __name__ == '__main__':
+    main()
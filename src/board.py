@@ -4,19 +4,29 @@ from math import sqrt
 from piece import Piece, create_default_pieces, create_piece, Pawn
 from pygame.locals import *
 from settings import Settings
-from axial import Axial, position_to_axial, axial_from_string
-from event_handler import EventHandler
+from axial import Axial, position_to_axial, axial_from_string, pixel_to_axial
+from event_handler import EventBus
 from copy import deepcopy, copy
+from rules import CELLS, PIECE_NAMES, move_from_iccf, move_to_iccf
+from profiler import timed, count
+from timeline import GameTimeline
 import sys
 
+# Empty boards, shared by every board with the same size and geometry
+board_layers: dict[tuple, pygame.Surface] = {}
+
+
+def get_piece_scale(dimensions: (int, int)) -> float:
+    return dimensions[0] * 0.0006875
+
 
 # noinspection PyTypeChecker
 class Board:
 
-    def __init__(self, surface: pygame.Surface, settings: Settings, test_mode=False):
+    def __init__(self, surface: pygame.Surface, settings: Settings, test_mode=False, dimensions: (int, int) = None):
         self.game_over = False
         self.piece_scale: float = 0.
-        self.event_handlers: list[EventHandler] | None = None
+        self.event_bus = EventBus()
         self.tile_height = None
         self.tile_width = None
         self.pieces: list[Piece] | None = None
@@ -29,6 +39,11 @@ class Board:
         self.promotion_flag = False
         self.highlighted_tiles = []
         self.in_check = False
+        self.board_layer: pygame.Surface | None = None
+        self.background: pygame.Surface | None = None
+        self.drawn_pieces: dict[Piece, (pygame.Rect, pygame.Surface)] = {}
+        self.dirty_rects: list[pygame.Rect] = []
+        self.redraw_all = True
 
         self.turn = 1
         self.move = 1
@@ -37,12 +52,21 @@ class Board:
         self.test_mode = test_mode
         self.state = []
 
+        # Test mode places pieces freely, so its moves can not be replayed from the starting position
+        self.timeline = GameTimeline() if not test_mode else None
+        self.review_ply: int | None = None  # Ply shown while looking back through the game, None when playing
+        self.player_color: int | None = None  # The only color moved here in a networked game, None for both
+
         #  Determining scale, x, and y for the board
-        self.scale = settings.dimensions[0] * 0.0009375
-        self.piece_scale = settings.dimensions[0] * 0.0006875
+        size = settings.dimensions if dimensions is None else dimensions
+        self.scale = size[0] * 0.0009375
+        self.piece_scale = get_piece_scale(size)
         half_board_width = 50 * self.scale * 16 / 2
-        self.startX = settings.dimensions[0] / 2 - half_board_width
-        self.startY = (settings.dimensions[0] / 100 - 6) * 30 + 190
+        self.startX = size[0] / 2 - half_board_width
+        if dimensions is None:
+            self.startY = (size[0] / 100 - 6) * 30 + 190
+        else:  # Boards given their own size are centred, without room for labels above them
+            self.startY = size[1] / 2 - sqrt(3) * 50 * self.scale * 5 / 2
 
     def generate_blank_board(self):
         colors = {
@@ -81,7 +105,40 @@ class Board:
                 else:
                     self.tiles[position_to_axial(tile.position).to_string()] = tile
 
-                tile.draw_tile(self.surface)
+        self.render_background()
+
+    def render_background(self):
+        # The empty board is drawn once, and each frame only copies the parts of it that changed
+        key = (self.surface.get_size(), self.scale, self.startX, self.startY)
+        self.board_layer = board_layers.get(key)
+
+        if self.board_layer is None:
+            self.board_layer = pygame.Surface(self.surface.get_size())
+            self.board_layer.fill(pygame.Color('grey'))
+
+            for tile in self.tiles.values():
+                tile.draw_tile(self.board_layer, tile.color)
+
+            board_layers[key] = self.board_layer
+
+        self.reset_background()
+
+    def reset_background(self):
+        """
+
+        Resets the background to the empty board. Anything drawn on the background afterwards, like labels, stays
+        under the tiles and pieces until the next reset.
+
+        """
+
+        self.background = self.board_layer.copy()
+        self.invalidate()
+
+    def invalidate(self, rect: pygame.Rect = None):
+        if rect is None:
+            self.redraw_all = True
+        else:
+            self.dirty_rects.append(rect)
 
     def setup_pieces(self, scale=1.0):
         self.pieces = create_default_pieces(0, self, scale)
@@ -124,10 +181,12 @@ class Board:
 
         return king_tile
 
+    @timed("simulate_move")
     def simulate_move(self, new_tile, piece):  # Simulates a move and tells if the move would put team in check
         in_check = False
         tiles = self.tiles
         tile_axial = position_to_axial(new_tile.position)
+        count("simulated_moves")
 
         piece_current_position = copy(piece.current_position)
         piece_rect_center = copy(piece.rect.center)
@@ -184,6 +243,7 @@ class Board:
 
         return in_check
 
+    @timed("team_in_check")
     def team_in_check(self, color: int) -> bool:
         king_tile = self.get_king_tile(color)
         if king_tile is None:
@@ -247,6 +307,8 @@ class Board:
                 (2, -1)
             ]
         }
+        # The king attacks the cells next to it in every direction a queen moves
+        capture_vectors["king"] = capture_vectors["queen"]
 
         for piece, vectors in capture_vectors.items():
             if piece == "pawn" or piece == "knight" or piece == "king":
@@ -288,24 +350,72 @@ class Board:
         return False
 
     def add_event_handlers(self):
-        self.event_handlers = [
-            EventHandler(MOUSEBUTTONDOWN, []),
-            EventHandler(MOUSEBUTTONUP, []),
-            EventHandler(KEYDOWN, [])
-        ]
-
-        for handler in self.event_handlers:
-            handler.add_subscriber(self, 0.025)
-
-    def update_board(self):
-        # Precondition is that the tiles that are legal moves should already have color filter
-        # applied
+        self.event_bus = EventBus()
+        for event_type in (MOUSEBUTTONDOWN, MOUSEBUTTONUP, KEYDOWN):
+            self.event_bus.subscribe(event_type, self, 0.025)
+
+    @timed("draw")
+    def update_board(self) -> list[pygame.Rect]:
+        """
+
+        Redraws the parts of the board that changed since the last call: tiles whose highlight changed and the old and
+        new rects of pieces that moved, were added or were removed. Highlights and pieces are drawn over the cached
+        background.
+
+        :return: The rects of the surface that were redrawn, for pygame.display.update
+        """
+
         if self.tiles is None:
-            return
+            return []
+
+        if self.background is None:
+            self.render_background()
+
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
 
         for tile in self.tiles.values():
-            tile.draw_tile(self.surface)
+            if tile.dirty:
+                dirty_rects.append(tile.rect)
+                tile.dirty = False
+
+        pieces = self.pieces if self.pieces is not None else []
+        drawn_pieces = {}
+        for piece in pieces:
+            drawn = self.drawn_pieces.pop(piece, None)
+            if drawn is None or drawn[0] != piece.rect or drawn[1] is not piece.image:
+                if drawn is not None:
+                    dirty_rects.append(drawn[0])
+                dirty_rects.append(piece.rect.copy())
+            drawn_pieces[piece] = (piece.rect.copy(), piece.image)
+
+        dirty_rects.extend(rect for rect, _ in self.drawn_pieces.values())  # Pieces removed since the last frame
+        self.drawn_pieces = drawn_pieces
+
+        if self.redraw_all:
+            self.redraw_all = False
+            dirty_rects = [self.surface.get_rect()]
+
+        if not dirty_rects:
+            return []
+
+        highlighted_tiles = [tile for tile in self.tiles.values() if tile.displayed_color != tile.color]
+
+        for rect in dirty_rects:
+            self.surface.set_clip(rect)
+            self.surface.blit(self.background, rect, rect)
 
+            for tile in highlighted_tiles:
+                if tile.rect.colliderect(rect):
+                    tile.draw_tile(self.surface)
+
+            self.surface.blits([(piece.image, piece.rect) for piece in pieces if piece.rect.colliderect(rect)], False)
+
+        self.surface.set_clip(None)
+
+        return dirty_rects
+
+    @timed("legal_moves")
     def get_legal_moves(self, piece: Piece):
         return piece.get_piece_moves(self.tiles)
 
@@ -343,6 +453,43 @@ class Board:
 
         self.highlighted_tiles.extend(legal_moves)
 
+    def set_position(self, position, last_move: (int, int, int) = None):
+        """
+
+        Shows a rules.Position, for boards that display a game instead of playing it. Only the pieces on cells that
+        changed are replaced.
+
+        :param position: The position to show
+        :param last_move: Move whose cells are highlighted
+        """
+
+        if self.pieces is None:
+            self.pieces = []
+            self.sprites = pygame.sprite.Group()
+
+        for cell, code in enumerate(position.cells):
+            tile = self.tiles.get(position_to_axial(CELLS[cell]).to_string())
+            piece = tile.piece
+
+            if piece is not None and (code >> 3 != piece.color or PIECE_NAMES.get(code & 7) != piece.name):
+                self.remove_piece(piece)
+                piece = None
+
+            if piece is None and code:
+                self.add_piece(create_piece(code >> 3, PIECE_NAMES[code & 7], CELLS[cell], self, self.piece_scale))
+
+        self.turn = position.turn
+        self.reset_highlighted_tiles()
+
+        if last_move is not None:
+            highlight = self.settings.highlight
+            for cell in last_move[:2]:
+                tile = self.tiles.get(position_to_axial(CELLS[cell]).to_string())
+                tile.apply_filter(pygame.Color(utilities.clamp(highlight[0], tile.color.r, 255),
+                                               utilities.clamp(highlight[1], tile.color.g, 255),
+                                               utilities.clamp(highlight[2], tile.color.b, 255)))
+                self.highlighted_tiles.append(tile)
+
     def reset_highlighted_tiles(self):
         for tile in self.highlighted_tiles:
             tile.reset_filter()
@@ -363,28 +510,33 @@ class Board:
             king_tile.apply_filter(new_color)
             self.highlighted_tiles.append(king_tile)
 
+    def tile_at(self, point: (float, float)):
+        return self.tiles.get(pixel_to_axial(self, point).to_string())
+
+    def piece_at(self, point: (float, float)) -> Piece | None:
+        tile = self.tile_at(point)
+        return tile.piece if tile is not None else None
+
     def mouse_button_down_handler(self, event: pygame.event.Event):
         if self.pieces is None:
             return
 
         if self.piece_selected is None:
-            for piece in self.pieces:
-                if not self.test_mode:
-                    if piece.color != self.turn:
-                        continue
+            piece = self.piece_at(event.pos)
+            if piece is None or (not self.test_mode and piece.color != self.turn):
+                return
+
+            if self.player_color is not None and piece.color != self.player_color:
+                return
 
-                self.piece_selected = piece.mouse_button_down_handler(event)
+            self.piece_selected = piece.mouse_button_down_handler(event)
 
-                if self.piece_selected is not None:
-                    self.highlight_legal_moves()
-                    break
+            if self.piece_selected is not None:
+                self.highlight_legal_moves()
 
     def mouse_button_up_handler(self, event: pygame.event.Event):
         if self.piece_selected is not None:
-            for piece in self.pieces:
-                valid_move = piece.mouse_button_up_handler(event)
-                if valid_move:
-                    break
+            self.piece_selected.mouse_button_up_handler(event)
 
             self.reset_highlighted_tiles()
             if self.in_check:
@@ -396,6 +548,9 @@ class Board:
         if not self.promotion_flag:
             return
 
+        if event.key > 0x10ffff:  # Function and arrow keys have no character
+            return
+
         key = chr(event.key)
 
         match key:
@@ -464,6 +619,10 @@ class Board:
         old_tile = tiles.get(position_to_axial(piece.previous_position).to_string())
         old_tile.piece = None
 
+        # Flagged before the move is recorded, which then waits for the promotion to be chosen
+        if type(piece) == Pawn and piece.on_last_rank():
+            self.promote_pawn()
+
         self.turn = 1 - self.turn
         self.last_piece_moved = piece
 
@@ -482,7 +641,22 @@ class Board:
 
         self.move += 0.5
 
-    def load_state(self, state: list[str]):
+    def load_state(self, state: list[str], trusted=False):
+        """
+
+        Plays a list of ICCF moves from the current position
+
+        :param state: The moves
+        :param trusted: If the moves are known to be legal and start from the starting position. They are then applied
+        to a rules.Position without check detection or highlighting, and only the final position is set up on the board.
+        """
+
+        if trusted:
+            self.timeline = GameTimeline([move_from_iccf(notation) for notation in state])
+            self.state = list(state)
+            self.show_live_position()
+            return
+
         for move in state:
             old_file_index = int(move[:2]) - 1
             old_rank = int(move[2:4])
@@ -525,6 +699,75 @@ class Board:
 
         notation = self.get_iccf_notation(self.last_piece_moved)
         self.state.append(notation)
+        if self.timeline is not None:
+            self.timeline.append(move_from_iccf(notation))
+
+    def seek(self, ply: int):
+        """
+
+        Shows the position after a ply of the game. Input is ignored until the last ply is shown again.
+
+        :param ply: The ply, clamped to the moves played
+        """
+
+        if self.timeline is None or self.piece_selected is not None or self.promotion_flag:
+            return
+
+        ply = max(0, min(ply, len(self.timeline)))
+        if ply == len(self.timeline):
+            if self.review_ply is not None:
+                self.review_ply = None
+                self.show_live_position()
+            return
+
+        self.review_ply = ply
+        self.set_position(self.timeline.position_at(ply), self.timeline.last_move(ply))
+
+    def play_move(self, move: (int, int, int)):
+        """
+
+        Plays a move made somewhere else, like the opponent's move in a networked game. While looking back through the
+        game, the move is only added to the moves played.
+
+        :param move: The move, trusted to be legal
+        """
+
+        self.timeline.append(move)
+        self.state.append(move_to_iccf(move))
+        if self.review_ply is None:
+            self.show_live_position()
+
+    def take_back(self, ply: int):
+        """
+
+        Takes back the moves played after a ply, like a move the server refused in a networked game
+
+        :param ply: The number of moves to keep
+        """
+
+        self.timeline.truncate(ply)
+        del self.state[len(self.timeline):]
+        self.review_ply = None
+        self.promotion_flag = False
+        self.game_over = False
+        self.show_live_position()
+
+    def show_live_position(self):
+        # Sets the board up at the end of the timeline, with what piece moves and the turn code rely on
+        self.set_position(self.timeline.position)
+        self.move = 1 + len(self.timeline) / 2
+
+        last_move = self.timeline.last_move(len(self.timeline))
+        if last_move is not None:
+            source, destination, _ = last_move
+            self.last_piece_moved = self.tiles.get(position_to_axial(CELLS[destination]).to_string()).piece
+            self.last_piece_moved.previous_position = CELLS[source]
+        else:
+            self.last_piece_moved = None
+
+        self.in_check = self.team_in_check(self.turn)
+        if self.in_check:
+            self.highlight_king_tile()
 
     def get_iccf_notation(self, piece) -> str:
         if piece.current_position == piece.previous_position:
@@ -552,36 +795,38 @@ class Board:
 
         return notation
 
-    def update(self, events: list[pygame.event.Event]) -> None:
+    def update(self, events: list[pygame.event.Event]) -> list[pygame.Rect]:
         if self.game_over:
-            return
+            return []
+
+        if self.review_ply is None:
+            self.handle_events(events)
+
+        if self.sprites is not None:
+            self.update_sprites()
+
+        return self.update_board()
 
+    @timed("events")
+    def handle_events(self, events: list[pygame.event.Event]):
         if self.promotion_flag:
             for event in events:
                 if event.type == KEYDOWN:
                     self.key_pressed_handler(event)
         else:
-            for event in events:
-                for event_handler in self.event_handlers:
-                    if event.type == event_handler.event_type:
-                        event_handler.event_triggered(event)
-                        break
+            self.event_bus.dispatch(events)
 
-        if self.sprites is not None:
-            self.sprites.update(self.tiles)
-            self.update_board()
-            self.sprites.draw(self.surface)
-        else:
-            self.update_board()
+    @timed("sprites")
+    def update_sprites(self):
+        self.sprites.update(self.tiles)
 
     def remove_piece(self, piece: Piece):
         self.pieces.remove(piece)
         self.sprites.remove(piece)
 
-        for tile in self.tiles.values():
-            if tile.piece == piece:
-                tile.piece = None
-                break
+        tile = self.tiles.get(position_to_axial(piece.current_position).to_string())
+        if tile is not None and tile.piece == piece:
+            tile.piece = None
 
     def promote_pawn(self):
         self.promotion_flag = True
@@ -595,12 +840,20 @@ class Tile:
         self.cartesian_coordinates = coordinates
         self.piece = piece
         self.size = size
+        self.vertices = utilities.regular_polygon_vertices(6, size, coordinates)
+        self.rect = utilities.bounding_rect(self.vertices)
+        self.dirty = False
+
+    def draw_tile(self, surface: pygame.surface.Surface, color: pygame.color.Color = None):
+        if color is None:
+            color = self.displayed_color
 
-    def draw_tile(self, surface: pygame.surface.Surface):
-        utilities.draw_regular_polygon(surface, self.displayed_color, 6, self.size, self.cartesian_coordinates)
+        pygame.draw.polygon(surface, color, self.vertices)
 
     def apply_filter(self, color: pygame.color.Color):
         self.displayed_color = color
+        self.dirty = True
 
     def reset_filter(self):
         self.displayed_color = self.color
+        self.dirty = True
@@ -1,21 +1,223 @@
-import socket
+"""
+Network client for playing on the game server without blocking the screen loop.
+
+The connection runs on an asyncio event loop in a background thread. The game thread queues frames to send, which
+never waits on the network, and polls once a frame for what has arrived. Heartbeats are sent while the connection is
+quiet, and a connection that has not answered within the timeout is closed as lost.
+
+    python client.py --host 127.0.0.1 --port 12345 --name alice
+"""
+
+import argparse
+import asyncio
+import queue
+import threading
 import time
+from protocol import (MOVE, PONG, COLOR, CLOCK, RESULT, RECORD, ERROR, reasons, read_frame, hello_frame, move_frame,
+                      resign_frame, ping_frame, parse_color, parse_clock, parse_result, parse_record, ProtocolError)
 
+# Messages about the connection itself, alongside the frame types of protocol.py
+CONNECTED = -1
+CLOSED = -2
 
-def main():
-    host = '127.0.0.1'
-    port = 12345
+parsers = {
+    COLOR: parse_color,
+    CLOCK: parse_clock,
+    RESULT: parse_result,
+    RECORD: parse_record,
+    ERROR: lambda payload: payload.decode(errors="replace")
+}
+
+
+class NetworkClient:
+    """
+
+    A connection to the game server. Messages are (type, value) pairs, where the type is a frame type from protocol.py
+    and the value is its parsed payload, or CONNECTED or CLOSED with None or why the connection closed.
+
+    """
+
+    def __init__(self, host: str, port: int, name="", connect_timeout=5., heartbeat_interval=2., timeout=10.,
+                 wake=None):
+        """
+
+        :param connect_timeout: Seconds to wait for the server to accept the connection
+        :param heartbeat_interval: Seconds without sending anything before a heartbeat is sent
+        :param timeout: Seconds without hearing from the server before the connection is lost
+        :param wake: Called from the network thread when a message arrives, to wake a waiting screen loop
+        """
+
+        self.host = host
+        self.port = port
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.timeout = timeout
+        self.wake = wake
+
+        self.received = queue.SimpleQueue()
+        self.outgoing: asyncio.Queue | None = None
+        self.connected = False
+        self.closed = False
+        self.latency: float | None = None  # Seconds for the last heartbeat to be answered
+        self.ping_sent: float | None = None
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_loop, name="network", daemon=True)
+        self.future = None
+
+    def start(self):
+        self.thread.start()
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), self.loop)
+
+    def run_loop(self):
+        self.loop.run_forever()
+        self.loop.close()
+
+    def send(self, data: bytes):
+        # Only queues the frame, so it is safe to call from the game thread at any time
+        if self.closed:
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self.queue_frame, data)
+        except RuntimeError:  # The loop stopped since the check
+            pass
+
+    def queue_frame(self, data: bytes):
+        if self.outgoing is not None:
+            self.outgoing.put_nowait(data)
+
+    def send_move(self, move: (int, int, int)):
+        self.send(move_frame(move))
 
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((host, port))
+    def resign(self):
+        self.send(resign_frame())
+
+    def poll(self) -> list[(int, object)]:
+        """
+
+        :return: The messages received since the last poll, without waiting
+        """
+
+        messages = []
+        try:
+            while True:
+                messages.append(self.received.get_nowait())
+        except queue.Empty:
+            return messages
+
+    def close(self):
+        if self.future is None:
+            return
+
+        if not self.closed:
+            try:
+                self.future.cancel()
+            except RuntimeError:  # The connection closed and the loop with it since the check
+                pass
+
+        self.thread.join(1.)
+
+    def deliver(self, message_type: int, value=None):
+        self.received.put((message_type, value))
+        if self.wake is not None:
+            self.wake()
+
+    async def run(self):
+        writer = None
+        reason = None
+
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                    self.connect_timeout)
+            self.outgoing = asyncio.Queue()
+            self.outgoing.put_nowait(hello_frame(self.name))
+            self.connected = True
+            self.deliver(CONNECTED)
+
+            sender = asyncio.create_task(self.send_frames(writer))
+            try:
+                await self.receive_frames(reader)
+            finally:
+                sender.cancel()
+                await asyncio.gather(sender, return_exceptions=True)
+        except asyncio.TimeoutError:
+            reason = "Timed out" if self.connected else "Connection timed out"
+        except (asyncio.IncompleteReadError, ConnectionError):
+            reason = "Connection lost" if self.connected else "Connection refused"
+        except (OSError, ProtocolError) as error:
+            reason = str(error)
+        except asyncio.CancelledError:
+            reason = "Closed"
+        finally:
+            if writer is not None:
+                writer.close()
+
+            self.connected = False
+            self.closed = True
+            self.deliver(CLOSED, reason)
+            self.loop.stop()
+
+    async def send_frames(self, writer: asyncio.StreamWriter):
+        # Waits for frames to send, or sends a heartbeat when there have been none for a while
+        while True:
+            try:
+                data = await asyncio.wait_for(self.outgoing.get(), self.heartbeat_interval)
+            except asyncio.TimeoutError:
+                self.ping_sent = time.monotonic()
+                data = ping_frame()
+
+            writer.write(data)
+            await writer.drain()
+
+    async def receive_frames(self, reader: asyncio.StreamReader):
+        while True:
+            frame_type, payload = await asyncio.wait_for(read_frame(reader), self.timeout)
+
+            if frame_type == PONG:
+                if self.ping_sent is not None:
+                    self.latency = time.monotonic() - self.ping_sent
+            elif frame_type == MOVE:
+                self.deliver(MOVE, payload)
+            elif frame_type in parsers:
+                self.deliver(frame_type, parsers[frame_type](payload))
+
+            if frame_type == RECORD:  # The last frame of a game, after which the server hangs up
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connects to the game server and prints what it sends")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--name", default="")
+    args = parser.parse_args()
 
-    print("Connected to server")
+    client = NetworkClient(args.host, args.port, args.name)
+    client.start()
 
-    start_time = time.time()
-    while time.time() - start_time < 10:
-        time.sleep(1)
+    running = True
+    try:
+        while running:
+            time.sleep(0.1)
+            for message_type, value in client.poll():
+                if message_type == CONNECTED:
+                    print("Connected to server")
+                elif message_type == COLOR:
+                    print(f"Playing {'white' if value[0] == 1 else 'black'} against {value[1]}")
+                elif message_type == RESULT:
+                    print(f"Result {value[0]} by {reasons[value[1]]}")
+                elif message_type == CLOSED:
+                    print(f"Disconnected: {value}")
+                    running = False
+                else:
+                    print(message_type, value)
+    except KeyboardInterrupt:
+        client.resign()
+        time.sleep(0.1)
 
-    client_socket.close()
+    client.close()
 
 
 if __name__ == "__main__":
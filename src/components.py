@@ -1,18 +1,45 @@
 import pygame
+from time import time
+from profiler import profiler
+from rules import CELLS, move_from_iccf
 from utilities import clamp
 
 
+class TextCache:
+    """
+
+    Keeps rendered text surfaces, so text is only rasterised again when the text, font or colour changes
+
+    """
+
+    def __init__(self):
+        self.surfaces: dict[str, (tuple, pygame.Surface)] = {}
+
+    def render(self, font: pygame.font.Font, text: str, color: pygame.Color, slot="text") -> pygame.Surface:
+        key = (font, text, tuple(color))
+        cached = self.surfaces.get(slot)
+
+        if cached is None or cached[0] != key:
+            cached = (key, font.render(text, True, color))
+            self.surfaces[slot] = cached
+
+        return cached[1]
+
+
 class Button:
     def __init__(self, x, y, width, height, text):
         self.rect = pygame.Rect(x, y, width, height)
         self.color = (255, 255, 255)
         self.text = text
+        self.text_cache = TextCache()
+        self.dirty = True
 
-    def draw(self, screen: pygame.surface.Surface, font: pygame.font.Font, text_color: pygame.Color) -> None:
+    def draw(self, screen: pygame.surface.Surface, font: pygame.font.Font, text_color: pygame.Color) -> pygame.Rect:
         pygame.draw.rect(screen, self.color, self.rect)
-        text_surface = font.render(self.text, True, text_color)
+        text_surface = self.text_cache.render(font, self.text, text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
+        return self.rect.union(text_rect)
 
     def is_clicked(self, pos: (float, float)) -> bool:
         return self.rect.collidepoint(pos)
@@ -23,17 +50,22 @@ class Label:
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.background_color = background_color
+        self.text_cache = TextCache()
+        self.dirty = True
 
-    def draw(self, screen: pygame.surface.Surface, font: pygame.font.Font, text_color: pygame.Color) -> None:
+    def draw(self, screen: pygame.surface.Surface, font: pygame.font.Font, text_color: pygame.Color) -> pygame.Rect:
         if self.background_color is not None:
             pygame.draw.rect(screen, self.background_color, self.rect)
 
-        text_surface = font.render(self.text, True, text_color)
+        text_surface = self.text_cache.render(font, self.text, text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
+        return text_rect if self.background_color is None else self.rect.union(text_rect)
 
     def set_text(self, text: str):
-        self.text = text
+        if text != self.text:
+            self.text = text
+            self.dirty = True
 
 
 class Dropdown:
@@ -42,23 +74,28 @@ class Dropdown:
         self.options = options
         self.selected_option: str | None = None
         self.is_open = False
+        self.text_cache = TextCache()
+        self.dirty = True
 
     def toggle_dropdown(self):
         self.is_open = not self.is_open
+        self.dirty = True
 
     def select_option(self, option: str):
         self.selected_option = option
         self.is_open = False
+        self.dirty = True
 
     def draw(self, screen: pygame.surface.Surface, font: pygame.font.Font, background_color: pygame.Color,
-             text_color: pygame.Color):
+             text_color: pygame.Color) -> pygame.Rect:
 
         pygame.draw.rect(screen, background_color, self.rect)
         pygame.draw.rect(screen, pygame.Color("black"), self.rect, 2)
+        drawn_rect = self.rect.copy()
 
         if self.selected_option:
-            selected_text = font.render(self.selected_option, True, text_color)
-            screen.blit(selected_text, (self.rect.x + 10, self.rect.y + 15))
+            selected_text = self.text_cache.render(font, self.selected_option, text_color)
+            drawn_rect.union_ip(screen.blit(selected_text, (self.rect.x + 10, self.rect.y + 15)))
 
         if self.is_open:
             for i, option in enumerate(self.options):
@@ -67,8 +104,11 @@ class Dropdown:
 
                 pygame.draw.rect(screen, background_color, option_rect)
                 pygame.draw.rect(screen, pygame.Color("black"), option_rect, 1)
-                option_text = font.render(option, True, text_color)
-                screen.blit(option_text, (option_rect.x + 10, option_rect.y + 15))
+                option_text = self.text_cache.render(font, option, text_color, option)
+                drawn_rect.union_ip(screen.blit(option_text, (option_rect.x + 10, option_rect.y + 15)))
+                drawn_rect.union_ip(option_rect)
+
+        return drawn_rect
 
 
 class Slider:
@@ -81,12 +121,19 @@ class Slider:
         self.step_value = step_value
         self.value = value
         self.text = text
+        self.text_cache = TextCache()
+        self.dirty = True
 
     def set_value(self, new_value):
-        self.value = max(self.min_value, min(new_value, self.max_value))
+        new_value = max(self.min_value, min(new_value, self.max_value))
+        if new_value != self.value:
+            self.value = new_value
+            self.dirty = True
 
     def set_text(self, new_text: str):
-        self.text = new_text
+        if new_text != self.text:
+            self.text = new_text
+            self.dirty = True
 
     def update_value(self, mouse_x):
         percentage = (mouse_x - self.rect.left) / self.rect.width
@@ -94,17 +141,22 @@ class Slider:
         new_value = round(new_value / self.step_value) * self.step_value
         self.set_value(new_value)
 
-    def draw(self, screen: pygame.Surface, font: pygame.font.Font, color: pygame.Color):
+    def draw(self, screen: pygame.Surface, font: pygame.font.Font, color: pygame.Color) -> pygame.Rect:
         pygame.draw.rect(screen, color, self.rect)
 
         knob_x = (self.rect.left + (self.value - self.min_value) / (self.max_value - self.min_value) * self.rect.width)
         knob_center = (knob_x, self.rect.centery)
         self.knob_rect = pygame.draw.circle(screen, pygame.Color('black'), knob_center, self.knob_radius)
 
-        text_surface = font.render(f"{self.text}: {self.value}", True, pygame.Color('black'))
+        text_surface = self.text_cache.render(font, f"{self.text}: {self.value}", pygame.Color('black'))
         text_rect = text_surface.get_rect(midleft=(self.rect.right + 10, self.rect.centery))
         screen.blit(text_surface, text_rect)
 
+        # The knob can stick out past either end of the bar
+        knob_area = pygame.Rect(0, 0, self.knob_radius * 2, self.knob_radius * 2)
+        knob_area.center = (self.rect.left, self.rect.centery)
+        return self.rect.union(text_rect).union(knob_area).union(knob_area.move(self.rect.width, 0))
+
 
 class RGBPicker:
     def __init__(self, x, y, width, height, color: (int, int, int), min_value=0, max_value=255, display_preview=False):
@@ -119,16 +171,27 @@ class RGBPicker:
             Slider(x + 5, y + 50, 200, min_value, max_value, color[2], "B")
         ]
         self.display_preview = display_preview
+        self.frame_dirty = True
+
+    @property
+    def dirty(self) -> bool:
+        return self.frame_dirty or any(slider.dirty for slider in self.sliders)
+
+    @dirty.setter
+    def dirty(self, dirty: bool):
+        self.frame_dirty = dirty
 
     def update_color(self):
         self.color = (int(self.sliders[0].value), int(self.sliders[1].value), int(self.sliders[2].value))
 
-    def draw(self, screen, font, background_color: pygame.Color, slider_background_color: pygame.Color):
+    def draw(self, screen, font, background_color: pygame.Color, slider_background_color: pygame.Color) -> pygame.Rect:
         pygame.draw.rect(screen, background_color, self.rect)
         pygame.draw.rect(screen, (0, 0, 0), self.rect, 2)
+        drawn_rect = self.rect.copy()
 
         for slider in self.sliders:
-            slider.draw(screen, font, slider_background_color)
+            drawn_rect.union_ip(slider.draw(screen, font, slider_background_color))
+            slider.dirty = False
 
         if self.display_preview:
             color_preview_rect = pygame.Rect(self.rect.right - 70, self.rect.topright[1], 70, 70)
@@ -137,3 +200,270 @@ class RGBPicker:
                          clamp(int(self.color[2]), 0, 0, 255))
             pygame.draw.rect(screen, pygame.Color(new_color), color_preview_rect)
             pygame.draw.rect(screen, (0, 0, 0), color_preview_rect, 2)
+            drawn_rect.union_ip(color_preview_rect)
+
+        return drawn_rect
+
+
+class ComponentGroup:
+    """
+
+    Retained set of components drawn over a flat background. Each component keeps the arguments it is drawn with, and
+    draw only repaints components that are dirty or whose arguments changed, along with anything they overlap.
+
+    """
+
+    def __init__(self, background_color: pygame.Color):
+        self.background_color = background_color
+        self.components = []
+        self.draw_args = {}
+        self.drawn_rects = {}
+        self.redraw_all = True
+
+    def add(self, component, *draw_args):
+        self.components.append(component)
+        self.draw_args[component] = draw_args
+        self.redraw_all = True
+
+    def set_args(self, component, *draw_args):
+        if self.draw_args[component] != draw_args:
+            self.draw_args[component] = draw_args
+            component.dirty = True
+
+    def invalidate(self):
+        self.redraw_all = True
+
+    def draw(self, screen: pygame.Surface) -> list[pygame.Rect]:
+        """
+
+        Repaints the changed components
+
+        :param screen: The surface to draw on
+        :return: The areas of the screen that changed, for pygame.display.update
+        """
+
+        if self.redraw_all:
+            self.redraw_all = False
+            screen.fill(self.background_color)
+            redrawn = list(self.components)
+            cleared = [screen.get_rect()]
+        else:
+            dirty = [component for component in self.components if component.dirty]
+            if not dirty:
+                return []
+
+            # Clear where the dirty components were, then redraw them and whatever else was in those areas
+            cleared = [self.drawn_rects[component] for component in dirty if component in self.drawn_rects]
+            for rect in cleared:
+                screen.fill(self.background_color, rect)
+
+            redrawn = [component for component in self.components
+                       if component in dirty or self.drawn_rects.get(component, pygame.Rect(0, 0, 0, 0))
+                       .collidelist(cleared) != -1]
+
+        for component in redrawn:
+            self.drawn_rects[component] = component.draw(screen, *self.draw_args[component])
+            component.dirty = False
+
+        return cleared + [self.drawn_rects[component] for component in redrawn]
+
+
+def move_text(ply: int, notation: str) -> str:
+    source, destination, promotion = move_from_iccf(notation)
+    text = f"{CELLS[source]}-{CELLS[destination]}"
+    if promotion:
+        text += "=" + "QRBN"[promotion - 1]
+
+    # White moves first, so even plies are white's
+    return f"{ply // 2 + 1}. {text}" if ply % 2 == 0 else f"{ply // 2 + 1}... {text}"
+
+
+class MoveHistory:
+    """
+
+    Scrollable list of the moves of a game, one ply per row. Only the rows in view are drawn, and the text of each row
+    is rendered once and cached while it stays near the view, so drawing costs the same however long the game is.
+
+    """
+
+    def __init__(self, x: int, y: int, width: int, height: int, font: pygame.font.Font, text_color: pygame.Color,
+                 background_color: pygame.Color, selected_color: pygame.Color):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.font = font
+        self.text_color = text_color
+        self.background_color = background_color
+        self.selected_color = selected_color
+        self.row_height = font.get_linesize()
+        self.visible_rows = max(height // self.row_height, 1)
+        self.moves: list[str] = []
+        self.move_count = 0
+        self.first_row = 0
+        self.follow = True  # Keeps the latest move in view until scrolled away from it
+        self.selected: int | None = None
+        self.row_surfaces: dict[int, (str, pygame.Surface)] = {}
+        self.dirty = True
+
+    def set_moves(self, moves: list[str]):
+        # Moves are only ever appended, so a change in length is a change in the moves
+        if moves is self.moves and len(moves) == self.move_count:
+            return
+
+        if moves is not self.moves:
+            self.row_surfaces.clear()
+
+        self.moves = moves
+        self.move_count = len(moves)
+        if self.follow:
+            self.first_row = max(self.move_count - self.visible_rows, 0)
+        self.dirty = True
+
+    def set_selected(self, ply: int | None):
+        if ply != self.selected:
+            self.selected = ply
+            if ply is not None and not self.first_row <= ply < self.first_row + self.visible_rows:
+                self.scroll(ply - self.first_row - self.visible_rows // 2)
+            self.dirty = True
+
+    def scroll(self, rows: int):
+        last_first_row = max(self.move_count - self.visible_rows, 0)
+        first_row = max(0, min(self.first_row + rows, last_first_row))
+        self.follow = first_row == last_first_row
+
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.dirty = True
+
+    def row_at(self, point: (float, float)) -> int | None:
+        """
+
+        :param point: A point on the screen
+        :return: The ply of the row at the point, or None if there is no row there
+        """
+
+        if not self.rect.collidepoint(point):
+            return None
+
+        ply = self.first_row + int((point[1] - self.rect.y) // self.row_height)
+        return ply if ply < self.move_count else None
+
+    def row_surface(self, ply: int) -> pygame.Surface:
+        notation = self.moves[ply]
+        cached = self.row_surfaces.get(ply)
+
+        if cached is None or cached[0] != notation:
+            cached = (notation, self.font.render(move_text(ply, notation), True, self.text_color))
+            self.row_surfaces[ply] = cached
+
+        return cached[1]
+
+    def draw(self, screen: pygame.Surface) -> pygame.Rect:
+        last_row = min(self.first_row + self.visible_rows, self.move_count)
+
+        # Rows scrolled well out of view are dropped, so the cache stays the size of a few pages
+        for ply in [ply for ply in self.row_surfaces
+                    if not self.first_row - self.visible_rows <= ply < last_row + self.visible_rows]:
+            del self.row_surfaces[ply]
+
+        pygame.draw.rect(screen, self.background_color, self.rect)
+        clip = screen.get_clip()
+        screen.set_clip(self.rect)
+
+        for ply in range(self.first_row, last_row):
+            y = self.rect.y + (ply - self.first_row) * self.row_height
+            if ply == self.selected:
+                pygame.draw.rect(screen, self.selected_color, (self.rect.x, y, self.rect.width, self.row_height))
+            screen.blit(self.row_surface(ply), (self.rect.x + 4, y))
+
+        screen.set_clip(clip)
+        self.dirty = False
+        return self.rect
+
+
+class ProfilerOverlay:
+    """
+
+    Shows the profiler's frame time breakdown and counters in a corner of the screen. Profiling is on while the
+    overlay is shown, and the text is refreshed a few times a second rather than every frame.
+
+    """
+
+    def __init__(self, x: int, y: int, font: pygame.font.Font, text_color: pygame.Color, refresh_interval=0.5,
+                 window=60):
+        self.x = x
+        self.y = y
+        self.font = font
+        self.text_color = text_color
+        self.refresh_interval = refresh_interval
+        self.window = window
+        self.visible = False
+        self.lines: list[str] = []
+        self.rect: pygame.Rect = None
+        self.last_refresh = 0.
+        self.text_cache = TextCache()
+        self.dirty = False
+
+    def toggle(self) -> pygame.Rect:
+        """
+
+        :return: The area the overlay covered if it was hidden, which has to be drawn over
+        """
+
+        self.visible = not self.visible
+        profiler.enabled = self.visible
+
+        if self.visible:
+            profiler.clear()
+            self.lines = ["Profiling..."]
+            self.last_refresh = time()
+            self.dirty = True
+            return None
+
+        rect, self.rect = self.rect, None
+        return rect
+
+    def refresh(self):
+        summary = profiler.summary(self.window)
+        frame_time = summary["frame_time"]
+        self.lines = [f"frame {frame_time['mean']:.2f} ms  p95 {frame_time['p95']:.2f}  max {frame_time['max']:.2f}"]
+        self.lines.extend(f"{name} {time_spent:.2f} ms" for name, time_spent in summary["sections"].items())
+        self.lines.extend(f"{name} {counts['mean']:.1f}/frame  max {counts['max']}"
+                          for name, counts in summary["counters"].items())
+
+        self.last_refresh = time()
+        self.dirty = True
+
+    def draw(self, screen: pygame.Surface, dirty_rects: list[pygame.Rect]) -> list[pygame.Rect]:
+        """
+
+        Draws the overlay if its text changed or something was drawn over it
+
+        :param screen: The surface to draw on
+        :param dirty_rects: The areas drawn this frame
+        :return: The areas the overlay drew
+        """
+
+        if not self.visible:
+            return []
+
+        if time() - self.last_refresh >= self.refresh_interval:
+            self.refresh()
+
+        if not self.dirty and (self.rect is None or self.rect.collidelist(dirty_rects) == -1):
+            return []
+
+        surfaces = [self.text_cache.render(self.font, line, self.text_color, i) for i, line in enumerate(self.lines)]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        height = sum(surface.get_height() for surface in surfaces) + 10
+
+        # Never shrinks, so text from an earlier, longer refresh is always painted over
+        rect = pygame.Rect(self.x, self.y, width, height)
+        self.rect = rect if self.rect is None else self.rect.union(rect)
+
+        pygame.draw.rect(screen, (0, 0, 0), self.rect)
+        y = self.y + 5
+        for surface in surfaces:
+            screen.blit(surface, (self.x + 5, y))
+            y += surface.get_height()
+
+        self.dirty = False
+        return [self.rect]
@@ -0,0 +1,139 @@
+import os
+
+# Diagrams are drawn without a window, so this has to be set before pygame is first imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import signal
+import time
+import pygame
+from itertools import islice
+from multiprocessing import Pool
+from board import Board
+from game_log import iter_games
+from rules import Position, starting_position, move_from_iccf
+from settings import Settings
+
+boards: dict[int, Board] = {}
+
+
+def diagram_key(position: Position) -> int:
+    # Zobrist hash of the pieces alone, since the side to move and en passant are not drawn
+    return Position(bytearray(position.cells)).key
+
+
+def diagram_path(directory: str, key: int, size: int) -> str:
+    return os.path.join(directory, f"{key:016x}_{size}.png")
+
+
+def initialize_worker() -> None:
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))  # Sprites are converted to the display format, so one has to exist
+
+    # SDL turns SIGTERM into a quit event, which would leave Pool.terminate waiting on the worker forever
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def get_board(size: int) -> Board:
+    if size not in boards:
+        board = Board(pygame.Surface((size, size)), Settings("settings.pkl"), dimensions=(size, size))
+        board.generate_blank_board()
+        boards[size] = board
+
+    return boards[size]
+
+
+def render_diagram(task: (bytes, int, str)) -> str:
+    """
+
+    Draws a position and saves it as a PNG
+
+    :param task: The cells of the position, the image size and the path to save to
+    :return: The path saved to
+    """
+
+    cells, size, path = task
+    board = get_board(size)
+    board.set_position(Position(bytearray(cells)))
+    board.update_board()
+
+    # Written under another name first, so an interrupted run never leaves a truncated diagram in the cache
+    temporary_path = path + ".tmp.png"
+    pygame.image.save(board.surface, temporary_path)
+    os.replace(temporary_path, path)
+    return path
+
+
+def game_positions(moves: list[str], every_ply: bool):
+    position = starting_position()
+    if every_ply:
+        yield position
+
+    for notation in moves:
+        position.apply(move_from_iccf(notation))
+        if every_ply:
+            yield position
+
+    if not every_ply:
+        yield position
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Renders position diagrams of logged games to PNG files")
+    parser.add_argument("logs", nargs="+", help="Game log files or directories")
+    parser.add_argument("--output", default="diagrams", help="Directory the diagrams are cached in")
+    parser.add_argument("--size", type=int, default=256, help="Width and height of each diagram")
+    parser.add_argument("--every-ply", action="store_true", help="Draw every position instead of the final one")
+    parser.add_argument("--index", default=None, help="JSON file listing the diagrams of each game")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Diagrams queued at a time")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    start_time = time.time()
+    index = []
+    queued = set()
+    cached = 0
+
+    def tasks():
+        nonlocal cached
+        for moves, _ in iter_games(args.logs):
+            paths = []
+            for position in game_positions(moves, args.every_ply):
+                path = diagram_path(args.output, diagram_key(position), args.size)
+                paths.append(os.path.basename(path))
+
+                if path in queued or os.path.exists(path):
+                    cached += 1
+                    continue
+
+                queued.add(path)
+                yield bytes(position.cells), args.size, path
+
+            if args.index is not None:
+                index.append(paths)
+
+    rendered = 0
+    pending = tasks()
+    with Pool(args.processes, initializer=initialize_worker) as pool:
+        while batch := list(islice(pending, args.batch_size)):
+            for _ in pool.imap_unordered(render_diagram, batch, chunksize=32):
+                rendered += 1
+
+            print(f"{rendered} rendered, {cached} cached, {time.time() - start_time:.1f}s")
+
+        pool.close()
+        pool.join()
+
+    if args.index is not None:
+        with open(args.index, 'w') as file:
+            json.dump(index, file)
+
+    elapsed = time.time() - start_time
+    print(f"Rendered {rendered} diagrams ({cached} already cached) in {elapsed:.1f}s, "
+          f"{rendered / max(elapsed, 1e-9) * 60:.0f} per minute")
+
+
+if __name__ == '__main__':
+    main()
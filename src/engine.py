@@ -0,0 +1,261 @@
+import time
+import evaluation
+from rules import Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, move_to_iccf, mirror_move
+
+mate_score = 100000
+infinity = mate_score + 1
+
+exact, lower_bound, upper_bound = range(3)
+
+# Used to order captures by most valuable victim, then least valuable attacker
+order_values = {0: 0, PAWN: 1, KNIGHT: 3, BISHOP: 3, ROOK: 5, QUEEN: 9, KING: 20}
+
+
+class SearchStopped(Exception):
+    pass
+
+
+class Search:
+    """
+
+    Alpha-beta search with iterative deepening, quiescence search and a transposition table. Mirror images share
+    table entries, which hold their move in the canonical orientation.
+
+    """
+
+    def __init__(self, table_size=1 << 20, weights: evaluation.Weights = None):
+        self.table_size = table_size
+        self.scores = evaluation.build_scores(weights) if weights is not None else None
+        self.table: dict[int, tuple] = {}
+        self.nodes = 0
+        self.max_nodes = None
+        self.deadline = None
+        self.stopped = False
+
+    def clear(self):
+        self.table = {}
+
+    def stop(self):
+        # Stays set until the caller clears it before the next search, so a stop sent from another thread just as a
+        # search starts is not lost
+        self.stopped = True
+
+    def search(self, position: Position, depth=None, nodes=None, movetime=None, info=None) -> ((int, int, int), int):
+        """
+
+        Searches a position until one of the limits is reached
+
+        :param position: The position to search
+        :param depth: The maximum depth in plies
+        :param nodes: The maximum number of nodes
+        :param movetime: The maximum time in milliseconds
+        :param info: Called with a dict after every completed depth
+        :return: The best move and its score in centipawns for the side to move
+        """
+
+        self.nodes = 0
+        self.max_nodes = nodes
+        start_time = time.time()
+        self.deadline = start_time + movetime / 1000 if movetime is not None else None
+
+        if depth is None:
+            depth = 64
+
+        best_move = None
+        best_score = 0
+        legal_moves = position.legal_moves()
+        if not legal_moves:
+            return None, -mate_score if position.in_check() else 0
+
+        for current_depth in range(1, depth + 1):
+            try:
+                score = self.negamax(position, current_depth, -infinity, infinity, 0)
+            except SearchStopped:
+                break
+
+            entry = self.probe(position)
+            if entry is not None and entry[3] is not None:
+                best_move = entry[3]
+            best_score = score
+
+            if info is not None:
+                elapsed = time.time() - start_time
+                info({
+                    "depth": current_depth,
+                    "score": score,
+                    "nodes": self.nodes,
+                    "time": int(elapsed * 1000),
+                    "nps": int(self.nodes / elapsed) if elapsed > 0 else 0,
+                    "pv": self.principal_variation(position, current_depth)
+                })
+
+            if abs(score) >= mate_score - current_depth:
+                break
+
+        if best_move is None:
+            best_move = legal_moves[0]
+
+        return best_move, best_score
+
+    def check_limits(self):
+        if self.stopped:
+            raise SearchStopped()
+
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchStopped()
+
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise SearchStopped()
+
+    def negamax(self, position: Position, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, ply)
+
+        original_alpha = alpha
+        entry = self.probe(position)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, table_move = entry
+            if entry_depth >= depth and ply > 0:
+                entry_score = score_from_table(entry_score, ply)
+                if entry_flag == exact:
+                    return entry_score
+                if entry_flag == lower_bound and entry_score >= beta:
+                    return entry_score
+                if entry_flag == upper_bound and entry_score <= alpha:
+                    return entry_score
+
+        color = position.turn
+        best_score = -infinity
+        best_move = None
+        legal_moves = 0
+
+        for move in order_moves(position, position.pseudo_legal_moves(), table_move):
+            child = position.copy()
+            child.apply(move)
+            if child.in_check(color):
+                continue
+
+            legal_moves += 1
+            score = -self.negamax(child, depth - 1, -beta, -alpha, ply + 1)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if legal_moves == 0:
+            return -(mate_score - ply) if position.in_check(color) else 0
+
+        if best_score <= original_alpha:
+            flag = upper_bound
+        elif best_score >= beta:
+            flag = lower_bound
+        else:
+            flag = exact
+
+        self.store(position, depth, score_to_table(best_score, ply), flag, best_move)
+
+        return best_score
+
+    def probe(self, position: Position) -> tuple | None:
+        entry = self.table.get(position.canonical_key())
+        if entry is not None and entry[3] is not None and position.is_mirrored():
+            return entry[0], entry[1], entry[2], mirror_move(entry[3])
+
+        return entry
+
+    def store(self, position: Position, depth: int, score: int, flag: int, move) -> None:
+        if len(self.table) >= self.table_size:
+            self.table = {}
+
+        if move is not None and position.is_mirrored():
+            move = mirror_move(move)
+
+        self.table[position.canonical_key()] = (depth, score, flag, move)
+
+    def quiescence(self, position: Position, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+
+        stand_pat = relative_score(position, self.scores)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        color = position.turn
+        cells = position.cells
+        captures = [move for move in position.pseudo_legal_moves() if cells[move[1]] or move[2]]
+
+        for move in order_moves(position, captures, None):
+            child = position.copy()
+            child.apply(move)
+            if child.in_check(color):
+                continue
+
+            score = -self.quiescence(child, -beta, -alpha, ply + 1)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def principal_variation(self, position: Position, depth: int) -> list[str]:
+        variation = []
+        position = position.copy()
+
+        for _ in range(depth):
+            entry = self.probe(position)
+            if entry is None or entry[3] is None or entry[3] not in position.legal_moves():
+                break
+
+            variation.append(move_to_iccf(entry[3]))
+            position.apply(entry[3])
+
+        return variation
+
+
+def relative_score(position: Position, piece_scores: list[list[float]] = None) -> int:
+    score = int(evaluation.evaluate(position, piece_scores))
+    return score if position.turn == 1 else -score
+
+
+def order_moves(position: Position, moves: list, table_move) -> list:
+    cells = position.cells
+
+    def priority(move):
+        if move == table_move:
+            return 1000
+        priority = order_values[cells[move[1]] & 7] * 10 - order_values[cells[move[0]] & 7]
+        if move[2] == 1:  # Queen promotions
+            priority += 90
+        return priority
+
+    return sorted(moves, key=priority, reverse=True)
+
+
+def score_to_table(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the node so they stay correct when reached through another path
+    if score >= mate_score - 1000:
+        return score + ply
+    if score <= -mate_score + 1000:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    if score >= mate_score - 1000:
+        return score - ply
+    if score <= -mate_score + 1000:
+        return score + ply
+    return score
@@ -0,0 +1,103 @@
+import json
+import os
+from rules import PIECE_NAMES, FLIP, MIRROR, piece_code
+
+default_piece_values = {
+    "pawn": 100,
+    "knight": 300,
+    "bishop": 325,
+    "rook": 500,
+    "queen": 900,
+    "king": 0
+}
+
+
+class Weights:
+    """
+
+    Piece values and piece-square tables used to evaluate positions. The tables have one entry per cell in
+    rules.CELLS order, seen from white's side of the board.
+
+    """
+
+    def __init__(self, file_path: str = None):
+        self.file_path = file_path
+        self.piece_values = dict(default_piece_values)
+        self.tables = {name: [0.] * 91 for name in PIECE_NAMES.values()}
+        self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        if file_path is not None:
+            self.load_weights()
+
+    def load_weights(self):
+        try:
+            with open(os.path.join(self.root_dir, self.file_path), 'r') as file:
+                weights = json.load(file)
+        except FileNotFoundError:
+            return
+
+        self.piece_values.update(weights.get("piece_values", {}))
+        self.tables.update(weights.get("tables", {}))
+
+    def save_weights(self):
+        with open(os.path.join(self.root_dir, self.file_path), 'w') as file:
+            json.dump({"piece_values": self.piece_values, "tables": self.tables}, file)
+
+
+def build_scores(weights: Weights) -> list[list[float]]:
+    # Score of every piece code on every cell from white's point of view, so evaluating is one lookup per piece.
+    # Tables are averaged with their mirror image so mirrored positions, which share table entries, score the same
+    scores = [[0.] * 91 for _ in range(15)]
+
+    for kind, name in PIECE_NAMES.items():
+        value = weights.piece_values[name]
+        table = [(weights.tables[name][cell] + weights.tables[name][MIRROR[cell]]) / 2 for cell in range(91)]
+
+        for cell in range(91):
+            scores[piece_code(1, kind)][cell] = value + table[cell]
+            scores[piece_code(0, kind)][cell] = -(value + table[FLIP[cell]])
+
+    return scores
+
+
+weights = Weights()
+scores = build_scores(weights)
+
+
+def load_weights(file_path="weights.json") -> Weights:
+    """
+
+    Loads tuned weights, falling back to the default piece values when the file does not exist
+
+    :param file_path: The weights file, absolute or relative to the project root
+    :return: The loaded weights
+    """
+
+    global weights, scores
+
+    weights = Weights(file_path)
+    scores = build_scores(weights)
+
+    return weights
+
+
+def evaluate(position, piece_scores: list[list[float]] = None) -> float:
+    """
+
+    Evaluates a position
+
+    :param position: A rules.Position
+    :param piece_scores: Scores from build_scores, defaults to the loaded weights
+    :return: The score in centipawns, positive when white is better
+    """
+
+    if piece_scores is None:
+        piece_scores = scores
+
+    score = 0.
+    for cell, code in enumerate(position.cells):
+        if code:
+            score += piece_scores[code][cell]
+
+    return score
+
@@ -1,38 +1,115 @@
 import pygame
-from piece import Piece
 from pygame.locals import *
 from time import time
 
+# Method called on subscribers that are objects rather than functions
+handler_names = {
+    MOUSEBUTTONDOWN: "mouse_button_down_handler",
+    MOUSEBUTTONUP: "mouse_button_up_handler",
+    MOUSEMOTION: "mouse_motion_handler",
+    KEYDOWN: "key_pressed_handler"
+}
+
+
+class Subscription:
+    def __init__(self, subscriber: object, callback, debounce_interval: float):
+        self.subscriber = subscriber
+        self.callback = callback
+        self.debounce_interval = debounce_interval
+        self.last_triggered = 0.
+        self.active = True
+
 
 class EventHandler:
-    def __init__(self, event_type: int, subscribers: list[object], debounce_intervals=None):
-        if debounce_intervals is None:
-            debounce_intervals = []
+    """
+
+    Subscribers of one event type. Each subscriber has its own debounce interval and time it was last triggered.
 
+    """
+
+    def __init__(self, event_type: int, subscribers: list[object] = None, debounce_intervals=None):
         self.event_type = event_type
-        self.subscribers = subscribers
-        self.last_triggered = 0
-        self.debounce_intervals = debounce_intervals
+        self.subscriptions: tuple[Subscription, ...] = ()
+
+        for i, subscriber in enumerate(subscribers or []):
+            self.add_subscriber(subscriber, debounce_intervals[i] if debounce_intervals else 0.)
 
     def add_subscriber(self, subscriber: object, debounce_interval=0.):
-        self.subscribers.append(subscriber)
-        self.debounce_intervals.append(debounce_interval)
+        if callable(subscriber):
+            callback = subscriber
+        else:
+            callback = getattr(subscriber, handler_names[self.event_type])
+
+        # The tuple is replaced rather than changed, so a dispatch in progress keeps iterating the old one
+        self.subscriptions = self.subscriptions + (Subscription(subscriber, callback, debounce_interval),)
 
     def remove_subscriber(self, subscriber: object):
-        self.subscribers.remove(subscriber)
+        for subscription in self.subscriptions:
+            if subscription.subscriber is subscriber:
+                subscription.active = False
+
+        self.subscriptions = tuple(subscription for subscription in self.subscriptions if subscription.active)
 
     def event_triggered(self, event: pygame.event.Event):
         triggered_time = time()
 
-        for i, subscriber in enumerate(self.subscribers):
-            if triggered_time - self.last_triggered < self.debounce_intervals[i]:
+        for subscription in self.subscriptions:
+            if not subscription.active:  # Removed earlier in this dispatch
+                continue
+
+            if triggered_time - subscription.last_triggered < subscription.debounce_interval:
                 continue
 
-            if event.type == MOUSEBUTTONDOWN:
-                subscriber.mouse_button_down_handler(event)
-            elif event.type == MOUSEBUTTONUP:
-                subscriber.mouse_button_up_handler(event)
-            elif event.type == KEYDOWN:
-                subscriber.key_pressed_handler(event)
+            subscription.last_triggered = triggered_time
+            subscription.callback(event)
+
+
+def coalesce_motion(events: list[pygame.event.Event]) -> list[pygame.event.Event]:
+    """
+
+    Merges each run of consecutive mouse motion events into one, at the last position and with the summed movement
+
+    :param events: The events of a frame
+    :return: The events with motion bursts merged
+    """
+
+    coalesced = []
+
+    for event in events:
+        if event.type == MOUSEMOTION and coalesced and coalesced[-1].type == MOUSEMOTION:
+            previous = coalesced[-1]
+            coalesced[-1] = pygame.event.Event(MOUSEMOTION, pos=event.pos, buttons=event.buttons,
+                                               rel=(previous.rel[0] + event.rel[0], previous.rel[1] + event.rel[1]),
+                                               touch=event.touch)
+        else:
+            coalesced.append(event)
+
+    return coalesced
+
+
+class EventBus:
+    """
+
+    Routes events to the handler for their type
+
+    """
+
+    def __init__(self):
+        self.handlers: dict[int, EventHandler] = {}
+
+    def subscribe(self, event_type: int, subscriber: object, debounce_interval=0.):
+        if event_type not in self.handlers:
+            self.handlers[event_type] = EventHandler(event_type)
+
+        self.handlers[event_type].add_subscriber(subscriber, debounce_interval)
+
+    def unsubscribe(self, event_type: int, subscriber: object):
+        handler = self.handlers.get(event_type)
+        if handler is not None:
+            handler.remove_subscriber(subscriber)
 
-        self.last_triggered = triggered_time
+    def dispatch(self, events: list[pygame.event.Event]):
+        for event in coalesce_motion(events):
+            handler = self.handlers.get(event.type)
+            if handler is not None:
+                handler.event_triggered(event)
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from itertools import islice
+from multiprocessing import Pool
+from features import plane_count, action_count, encode_planes, encode_mask
+from game_log import iter_games
+from rules import starting_position, move_from_iccf
+
+mask_bytes = (action_count + 7) // 8
+
+# Shape and type of one position in each array of a shard
+fields = {
+    "planes": ((plane_count, 91), np.uint8),
+    "turns": ((), np.uint8),
+    "masks": ((mask_bytes,), np.uint8),
+    "results": ((), np.float32)
+}
+
+
+def replay_game(game: (list[str], float | None)) -> dict[str, np.ndarray]:
+    """
+
+    Replays a game and encodes every position before each move
+
+    :param game: The ICCF moves and the result for white, or None to score the final position
+    :return: One array per field, with a row per position
+    """
+
+    moves, result = game
+    position = starting_position()
+    count = len(moves)
+
+    planes = np.zeros((count, plane_count, 91), dtype=np.uint8)
+    turns = np.zeros(count, dtype=np.uint8)
+    masks = np.zeros((count, action_count), dtype=np.uint8)
+
+    for i, notation in enumerate(moves):
+        encode_planes(position, planes[i])
+        turns[i] = position.turn
+        encode_mask(position.legal_moves(), masks[i])
+        position.apply(move_from_iccf(notation))
+
+    if result is None:
+        result = position.result()
+        if result is None:
+            result = 0.5
+
+    return {
+        "planes": planes,
+        "turns": turns,
+        "masks": np.packbits(masks, axis=1),
+        "results": np.full(count, result, dtype=np.float32)
+    }
+
+
+class ShardWriter:
+    """
+
+    Writes positions to numbered .npy shards of a fixed size through memory maps, so only the shard being filled is
+    touched
+
+    """
+
+    def __init__(self, directory: str, shard_size: int):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.shards: list[dict] = []
+        self.arrays: dict[str, np.ndarray] | None = None
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, shard: int, field: str) -> str:
+        return os.path.join(self.directory, f"{field}_{shard:05d}.npy")
+
+    def open_shard(self):
+        shard = len(self.shards)
+        self.arrays = {
+            field: np.lib.format.open_memmap(self.path(shard, field), mode="w+", dtype=dtype,
+                                             shape=(self.shard_size,) + shape)
+            for field, (shape, dtype) in fields.items()
+        }
+        self.count = 0
+
+    def close_shard(self):
+        if self.arrays is None:
+            return
+
+        shard = len(self.shards)
+        arrays = self.arrays
+        self.arrays = None
+
+        for array in arrays.values():
+            array.flush()
+
+        if self.count < self.shard_size:  # Shrink the last shard to the positions it holds
+            for field, (shape, dtype) in fields.items():
+                trimmed = np.lib.format.open_memmap(self.path(shard, field) + ".tmp", mode="w+", dtype=dtype,
+                                                    shape=(self.count,) + shape)
+                trimmed[:] = arrays[field][:self.count]
+                trimmed.flush()
+
+            del arrays, trimmed
+            for field in fields:
+                os.replace(self.path(shard, field) + ".tmp", self.path(shard, field))
+
+        self.shards.append({"index": shard, "positions": self.count})
+
+    def write(self, rows: dict[str, np.ndarray]):
+        written = 0
+        total = len(rows["turns"])
+
+        while written < total:
+            if self.arrays is None:
+                self.open_shard()
+
+            space = min(self.shard_size - self.count, total - written)
+            for field, array in self.arrays.items():
+                array[self.count:self.count + space] = rows[field][written:written + space]
+
+            self.count += space
+            written += space
+
+            if self.count == self.shard_size:
+                self.close_shard()
+
+    def close(self):
+        self.close_shard()
+
+        with open(os.path.join(self.directory, "manifest.json"), 'w') as file:
+            json.dump({
+                "shards": self.shards,
+                "fields": {field: {"shape": list(shape), "dtype": np.dtype(dtype).name}
+                           for field, (shape, dtype) in fields.items()},
+                "mask_bits": action_count
+            }, file, indent=2)
+
+
+def open_shards(directory: str):
+    """
+
+    Memory maps the exported shards without copying them
+
+    :param directory: The export directory
+    :return: A generator of dicts of read-only arrays, one per shard
+    """
+
+    with open(os.path.join(directory, "manifest.json"), 'r') as file:
+        manifest = json.load(file)
+
+    for shard in manifest["shards"]:
+        yield {field: np.load(os.path.join(directory, f"{field}_{shard['index']:05d}.npy"), mmap_mode="r")
+               for field in fields}
+
+
+def unpack_masks(masks: np.ndarray) -> np.ndarray:
+    return np.unpackbits(masks, axis=-1, count=action_count).astype(bool)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Exports logged games as training data shards")
+    parser.add_argument("logs", nargs="+", help="Game log files or directories")
+    parser.add_argument("--output", default="shards", help="Directory to write the shards to")
+    parser.add_argument("--shard-size", type=int, default=65536, help="Positions per shard")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Games read into memory at a time")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    writer = ShardWriter(args.output, args.shard_size)
+    games = iter_games(args.logs)
+    game_count = 0
+    position_count = 0
+    start_time = time.time()
+
+    with Pool(args.processes) as pool:
+        while batch := list(islice(games, args.batch_size)):
+            for rows in pool.imap(replay_game, batch, chunksize=16):
+                writer.write(rows)
+                position_count += len(rows["turns"])
+
+            game_count += len(batch)
+            print(f"{game_count} games, {position_count} positions, {time.time() - start_time:.1f}s")
+
+    writer.close()
+    print(f"Wrote {len(writer.shards)} shards to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
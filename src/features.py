@@ -0,0 +1,67 @@
+"""
+NumPy encodings of rules.Position for training. Observations have one plane of 91 cells per piece kind and color,
+plus planes for the side to move and the en passant cell. Actions are source * 91 + destination, and pawn moves to
+the last rank promote to a queen.
+"""
+
+import numpy as np
+from rules import PROMOTIONS, QUEEN
+
+piece_planes = 12
+plane_count = piece_planes + 2
+turn_plane = piece_planes
+en_passant_plane = piece_planes + 1
+action_count = 91 * 91
+
+queen_promotion = next(digit for digit, kind in PROMOTIONS.items() if kind == QUEEN)
+
+# Plane of every piece code: white pieces use planes 0-5 and black pieces 6-11
+code_planes = np.zeros(15, dtype=np.intp)
+for kind in range(1, 7):
+    code_planes[8 | kind] = kind - 1
+    code_planes[kind] = 6 + kind - 1
+
+
+def encode_planes(position, out: np.ndarray) -> np.ndarray:
+    """
+
+    Writes the observation planes of a position
+
+    :param position: A rules.Position
+    :param out: Array of shape (plane_count, 91) to write into
+    :return: out
+    """
+
+    out[:] = 0
+    cells = np.frombuffer(position.cells, dtype=np.uint8)
+    occupied = np.flatnonzero(cells)
+    out[code_planes[cells[occupied]], occupied] = 1
+
+    if position.turn:
+        out[turn_plane] = 1
+    if position.en_passant != -1:
+        out[en_passant_plane, position.en_passant] = 1
+
+    return out
+
+
+def move_to_action(move: (int, int, int)) -> int:
+    return move[0] * 91 + move[1]
+
+
+def action_to_move(action: int, legal_moves: list) -> tuple | None:
+    source, destination = divmod(int(action), 91)
+
+    for move in legal_moves:
+        if move[0] == source and move[1] == destination and move[2] in (0, queen_promotion):
+            return move
+
+    return None
+
+
+def encode_mask(legal_moves: list, out: np.ndarray) -> np.ndarray:
+    out[:] = 0
+    if legal_moves:
+        out[[move[0] * 91 + move[1] for move in legal_moves]] = 1
+
+    return out
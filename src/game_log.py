@@ -0,0 +1,76 @@
+import os
+import re
+
+move_pattern = re.compile(r"\b\d{8,9}\b")
+result_pattern = re.compile(r"(?<![\d/])(1-0|0-1|1/2-1/2)(?![\d/])")
+
+results = {
+    "1-0": 1.,
+    "0-1": 0.,
+    "1/2-1/2": 0.5
+}
+
+
+def merge_promotions(moves: list[str]) -> list[str]:
+    # The game used to record a promotion twice, as a plain move and then again with the piece chosen
+    merged = []
+    for move in moves:
+        if len(move) == 9 and merged and merged[-1] == move[:8]:
+            merged[-1] = move
+        else:
+            merged.append(move)
+
+    return merged
+
+
+def parse_game(line: str) -> (list[str], float | None):
+    """
+
+    Parses one game from a log line. Lines are the board.state lists printed by game_loop, optionally followed by a
+    result (1-0, 0-1 or 1/2-1/2). Promotions recorded twice by older versions of the game are merged into one move.
+
+    :param line: The log line
+    :return: The ICCF moves and the result for white, or None if the line has no result
+    """
+
+    result = result_pattern.search(line)
+    return merge_promotions(move_pattern.findall(line)), results[result.group(1)] if result is not None else None
+
+
+def format_game(state: list[str], result: float | None = None) -> str:
+    line = str(state)
+    for token, value in results.items():
+        if result == value:
+            line += " " + token
+
+    return line
+
+
+def log_files(paths: list[str]) -> list[str]:
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, file_names in sorted(os.walk(path)):
+                files.extend(os.path.join(directory, file_name) for file_name in sorted(file_names))
+        else:
+            files.append(path)
+
+    return files
+
+
+def iter_games(paths: list[str]):
+    """
+
+    Streams the games in the given log files and directories, one line at a time
+
+    :param paths: Log files or directories of log files
+    :return: A generator of (moves, result) tuples
+    """
+
+    for file_name in log_files(paths):
+        with open(file_name, 'r') as file:
+            for line in file:
+                moves, result = parse_game(line)
+                if moves:
+                    yield moves, result
@@ -0,0 +1,299 @@
+"""
+Records the input of a game or test mode session, and replays it headlessly to measure frame times.
+
+    python input_replay.py record session.jsonl --screen game
+    python input_replay.py replay session.jsonl --runs 5 --json timings.json
+    python input_replay.py replay session.jsonl --profile profile.json --trace trace.json
+
+A recording is JSON lines: a header with the screen and window size, then one line per frame that had input, holding
+the frame number, the time since the start, the mouse position and the events. Replay feeds every frame the events
+it had when recorded, so the same recording does the same work on every run. Frames with input are held back until
+their recorded time, since debouncing and key repeat depend on it, but frames without input run back to back.
+With --profile, the profiler breaks each frame down by section over all runs; --trace saves the sections as a Chrome
+trace, which chrome://tracing and Perfetto can open.
+"""
+
+import os
+import sys
+
+if len(sys.argv) > 1 and sys.argv[1] == "replay":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import time
+import pygame
+from pygame.locals import *
+import scheduler
+from main import game_loop, test_mode
+from profiler import profiler
+from scheduler import FrameScheduler
+from settings import Settings
+
+recorded_events = {MOUSEMOTION, MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEWHEEL, KEYDOWN, KEYUP, TEXTINPUT}
+screens = {
+    "game": game_loop,
+    "test": test_mode
+}
+
+
+def event_to_dict(event: pygame.event.Event) -> dict:
+    values = {"type": event.type}
+    for name, value in event.dict.items():
+        if isinstance(value, tuple):
+            value = list(value)
+        if isinstance(value, (bool, int, float, str, list)):
+            values[name] = value
+
+    return values
+
+
+def event_from_dict(values: dict) -> pygame.event.Event:
+    attributes = {name: tuple(value) if isinstance(value, list) else value
+                  for name, value in values.items() if name != "type"}
+    return pygame.event.Event(values["type"], attributes)
+
+
+class RecordingScheduler(FrameScheduler):
+    """
+
+    Paces frames like FrameScheduler, and writes the input of each frame to a file
+
+    """
+
+    def __init__(self, file, fps=60, idle_timeout=250):
+        super().__init__(fps, idle_timeout)
+        self.file = file
+        self.frame = 0
+        self.start_time = time.perf_counter()
+        self.mouse_position = None
+
+    def get_events(self) -> list[pygame.event.Event]:
+        events = super().get_events()
+        self.frame += 1
+
+        inputs = [event_to_dict(event) for event in events if event.type in recorded_events]
+        mouse_position = pygame.mouse.get_pos()
+
+        if inputs or mouse_position != self.mouse_position:
+            self.mouse_position = mouse_position
+            self.file.write(json.dumps({
+                "frame": self.frame,
+                "time": round(time.perf_counter() - self.start_time, 4),
+                "mouse": list(mouse_position),
+                "events": inputs
+            }) + "\n")
+            self.file.flush()
+
+        return events
+
+
+class KeyState:
+    # Stands in for the result of pygame.key.get_pressed
+    def __init__(self, pressed: set[int]):
+        self.pressed = pressed
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.pressed
+
+
+class ReplayScheduler(FrameScheduler):
+    """
+
+    Feeds recorded input back frame by frame and times each frame. Frame time runs from handing out a frame's events
+    to the next call, so it covers the event handling, board update and drawing, but not the wait for a recorded
+    input. Latency is the frame time of frames that had input.
+
+    """
+
+    def __init__(self, frames: dict[int, dict], last_frame: int, speed=1.):
+        super().__init__()
+        self.frames = frames
+        self.last_frame = last_frame
+        self.speed = speed
+        self.frame = 0
+        self.start_time = time.perf_counter()
+        self.mouse_position = (0, 0)
+        self.pressed_keys = set()
+        self.frame_start = None
+        self.had_input = False
+        self.frame_times = []
+        self.latencies = []
+
+    def get_events(self) -> list[pygame.event.Event]:
+        profiler.end_frame()
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frame_times.append(now - self.frame_start)
+            if self.had_input:
+                self.latencies.append(now - self.frame_start)
+
+        self.frame += 1
+        if self.frame > self.last_frame:
+            return [pygame.event.Event(QUIT)]
+
+        events = []
+        recorded = self.frames.get(self.frame)
+        if recorded is not None:
+            delay = self.start_time + recorded["time"] / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            self.mouse_position = tuple(recorded["mouse"])
+            events = [event_from_dict(values) for values in recorded["events"]]
+
+            for event in events:
+                if event.type == KEYDOWN:
+                    self.pressed_keys.add(event.key)
+                elif event.type == KEYUP:
+                    self.pressed_keys.discard(event.key)
+
+        pygame.event.pump()
+        self.had_input = bool(events)
+        self.frame_start = time.perf_counter()
+        profiler.begin_frame()
+        return events
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.
+
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(values: list[float]) -> dict:
+    milliseconds = [value * 1000 for value in values]
+    return {
+        "count": len(milliseconds),
+        "mean": sum(milliseconds) / max(len(milliseconds), 1),
+        "p50": percentile(milliseconds, 0.5),
+        "p95": percentile(milliseconds, 0.95),
+        "p99": percentile(milliseconds, 0.99),
+        "max": max(milliseconds, default=0.)
+    }
+
+
+def load_recording(file_name: str) -> (dict, dict[int, dict]):
+    with open(file_name, 'r') as file:
+        header = json.loads(file.readline())
+        frames = {}
+        for line in file:
+            record = json.loads(line)
+            frames[record["frame"]] = record
+
+    return header, frames
+
+
+def run_screen(screen: str, settings: Settings) -> None:
+    try:
+        screens[screen](settings)
+    except SystemExit:  # The screens exit the program on quit
+        pass
+
+
+def record(file_name: str, screen: str) -> None:
+    pygame.init()
+    pygame.display.set_caption("Hexagonal Chess")
+    settings = Settings("settings.pkl")
+
+    with open(file_name, 'w') as file:
+        file.write(json.dumps({"screen": screen, "dimensions": list(settings.dimensions)}) + "\n")
+        recorder = RecordingScheduler(file)
+
+        def attach(fps=60, idle_timeout=250):
+            # Every screen shares the recorder, so frame numbers keep counting across screens
+            recorder.fps, recorder.idle_timeout = fps, idle_timeout
+            recorder.dirty, recorder.animating = True, False
+            return recorder
+
+        scheduler.scheduler_factory = attach
+        run_screen(screen, settings)
+
+    print(f"Recorded {recorder.frame} frames to {file_name}")
+
+
+def replay(file_name: str, speed=1.) -> dict:
+    """
+
+    Replays a recording once
+
+    :param file_name: The recording
+    :param speed: How many times faster than recorded to replay
+    :return: Frame time and latency statistics in milliseconds
+    """
+
+    header, frames = load_recording(file_name)
+    pygame.init()
+
+    settings = Settings("settings.pkl")
+    settings.dimensions = tuple(header["dimensions"])
+
+    replayer = ReplayScheduler(frames, max(frames, default=0), speed)
+
+    def attach(fps=60, idle_timeout=250):
+        replayer.dirty, replayer.animating = True, False
+        return replayer
+
+    scheduler.scheduler_factory = attach
+    get_pos, get_pressed = pygame.mouse.get_pos, pygame.key.get_pressed
+    pygame.mouse.get_pos = lambda: replayer.mouse_position
+    pygame.key.get_pressed = lambda: KeyState(replayer.pressed_keys)
+
+    try:
+        run_screen(header["screen"], settings)
+    finally:
+        pygame.mouse.get_pos, pygame.key.get_pressed = get_pos, get_pressed
+        scheduler.scheduler_factory = FrameScheduler
+
+    return {
+        "frames": summarize(replayer.frame_times),
+        "input_latency": summarize(replayer.latencies)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Records and replays UI input to measure frame times")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("recording", help="Recording file")
+    parser.add_argument("--screen", choices=list(screens), default="game", help="Screen to record")
+    parser.add_argument("--runs", type=int, default=3, help="Times to replay the recording")
+    parser.add_argument("--speed", type=float, default=1., help="Replay this many times faster than recorded")
+    parser.add_argument("--json", default=None, help="File to write the replay statistics to")
+    parser.add_argument("--profile", default=None, help="File to write the profiler's frame breakdown to")
+    parser.add_argument("--trace", default=None, help="File to write a Chrome trace of the profiled sections to")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(args.recording, args.screen)
+        return
+
+    profiler.enabled = args.profile is not None or args.trace is not None
+    profiler.set_history(None)
+
+    runs = []
+    for run in range(args.runs):
+        stats = replay(args.recording, args.speed)
+        runs.append(stats)
+
+        frames, latency = stats["frames"], stats["input_latency"]
+        print(f"Run {run + 1}: {frames['count']} frames, frame time mean {frames['mean']:.2f} ms, "
+              f"p50 {frames['p50']:.2f}, p95 {frames['p95']:.2f}, p99 {frames['p99']:.2f}, max {frames['max']:.2f}; "
+              f"input latency p50 {latency['p50']:.2f}, p95 {latency['p95']:.2f}, p99 {latency['p99']:.2f}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(runs, file, indent=2)
+
+    if args.profile is not None:
+        profiler.save(args.profile)
+        for name, time_spent in profiler.summary()["sections"].items():
+            print(f"{name}: {time_spent:.3f} ms per frame")
+
+    if args.trace is not None:
+        profiler.save_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
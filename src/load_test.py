@@ -0,0 +1,271 @@
+"""
+Load tests the game server with simulated clients.
+
+    python server.py --port 12345 &
+    python load_test.py --clients 2000 --processes 4 --connect-rate 500 --move-rate 2
+
+Each client connects, plays the game the server pairs it into and disconnects when it ends. Moves are random legal
+moves, or with --logs, the moves of logged games, which skips move generation so the clients cost less than the
+server. Both players of a game pick the same logged game from white's name.
+
+Move relay latency is the time from one client sending a move to its opponent receiving it. Clients in different
+processes are compared by time.monotonic, which is the same clock for every process on one machine.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import time
+from multiprocessing import Pool
+from zlib import crc32
+from game_log import iter_games
+from protocol import (MOVE, COLOR, RESULT, RECORD, ERROR, read_frame, parse_color, parse_result, hello_frame,
+                      move_frame, resign_frame)
+from rules import starting_position, move_from_iccf
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.
+
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def raise_file_limit():
+    # Every client is a socket, so the default limit of open files is soon reached
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def new_stats(name: str) -> dict:
+    return {"name": name, "opponent": None, "connected_at": None, "connect_time": None, "sent": [], "received": [],
+            "result": None, "errors": 0, "disconnected": False, "failure": None}
+
+
+async def play_client(name: str, host: str, port: int, scripts: list[list], move_interval: float,
+                      max_plies: int) -> dict:
+    """
+
+    Connects a client and plays one game
+
+    :param name: The client's name, unique across processes
+    :param scripts: Games to play the moves of, or an empty list to play random legal moves
+    :param move_interval: Seconds to wait before each move
+    :param max_plies: Plies after which the side to move resigns
+    :return: Timings and the outcome of the game
+    """
+
+    stats = new_stats(name)
+    rng = random.Random(name)
+    start = time.monotonic()
+
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats["disconnected"] = True
+        return stats
+
+    stats["connected_at"] = time.monotonic()
+    stats["connect_time"] = stats["connected_at"] - start
+    writer.write(hello_frame(name))
+
+    color = None
+    position = None
+    script = None
+    ply = 0
+
+    try:
+        while True:
+            frame_type, payload = await read_frame(reader)
+
+            if frame_type == COLOR:
+                color, stats["opponent"] = parse_color(payload)
+                if scripts:
+                    white = name if color == 1 else stats["opponent"]
+                    script = scripts[crc32(white.encode()) % len(scripts)]
+                else:
+                    position = starting_position()
+            elif frame_type == MOVE:
+                stats["received"].append(time.monotonic())
+                ply += 1
+                if position is not None:
+                    position.apply(payload)
+            elif frame_type == RESULT:
+                stats["result"] = parse_result(payload)[0]
+                continue
+            elif frame_type == RECORD:
+                break
+            elif frame_type == ERROR:
+                stats["errors"] += 1
+                if color is None:  # Refused before the game started
+                    break
+                continue
+            else:
+                continue
+
+            # White moves on even plies
+            if color is None or (ply % 2 == 0) != (color == 1):
+                continue
+
+            if ply >= max_plies or (script is not None and ply >= len(script)):
+                writer.write(resign_frame())
+                continue
+
+            if script is not None:
+                move = script[ply]
+            else:
+                legal_moves = position.legal_moves()
+                if not legal_moves:  # Mated or stalemated, so the server sends the result next
+                    continue
+
+                move = rng.choice(legal_moves)
+                position.apply(move)
+
+            if move_interval > 0:
+                await asyncio.sleep(move_interval)
+
+            writer.write(move_frame(move))
+            stats["sent"].append(time.monotonic())
+            ply += 1
+    except (asyncio.IncompleteReadError, ConnectionError):
+        stats["disconnected"] = stats["result"] is None
+
+    writer.close()
+    return stats
+
+
+async def run_clients(names: list[str], host: str, port: int, scripts: list[list], connect_rate: float,
+                      move_interval: float, max_plies: int) -> list[dict]:
+    start = time.monotonic()
+    tasks = []
+
+    for i, name in enumerate(names):
+        delay = start + i / connect_rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        tasks.append(asyncio.create_task(play_client(name, host, port, scripts, move_interval, max_plies)))
+
+    # A client that fails is reported with its error, instead of taking the rest of the process down with it
+    clients = []
+    for name, outcome in zip(names, await asyncio.gather(*tasks, return_exceptions=True)):
+        if isinstance(outcome, Exception):
+            stats = new_stats(name)
+            stats["failure"] = f"{type(outcome).__name__}: {outcome}"
+            outcome = stats
+        clients.append(outcome)
+
+    return clients
+
+
+def run_process(task: (list[str], dict)) -> list[dict]:
+    names, options = task
+    raise_file_limit()
+    return asyncio.run(run_clients(names, **options))
+
+
+def load_scripts(paths: list[str], count: int) -> list[list]:
+    scripts = []
+    for moves, _ in iter_games(paths):
+        scripts.append([move_from_iccf(notation) for notation in moves])
+        if len(scripts) >= count:
+            break
+
+    return scripts
+
+
+def summarize(clients: list[dict], start: float) -> dict:
+    """
+
+    :param clients: The stats of every client
+    :param start: When the test started, from time.monotonic
+    :return: Connection rate, move throughput, relay latency percentiles in milliseconds and error counts
+    """
+
+    by_name = {client["name"]: client for client in clients}
+    connected = [client["connected_at"] for client in clients if client["connected_at"] is not None]
+
+    latencies = []
+    for client in clients:
+        opponent = by_name.get(client["opponent"])
+        if opponent is not None:
+            latencies.extend((received - sent) * 1000 for sent, received in zip(opponent["sent"], client["received"]))
+
+    sent = [sent for client in clients for sent in client["sent"]]
+    move_time = max(sent) - min(sent) if len(sent) > 1 else 0.
+    connect_time = max(connected) - start if connected else 0.
+
+    return {
+        "clients": len(clients),
+        "connected": len(connected),
+        "connections_per_second": len(connected) / connect_time if connect_time > 0 else 0.,
+        "connect_time_p95_ms": percentile([client["connect_time"] * 1000 for client in clients
+                                           if client["connect_time"] is not None], 0.95),
+        "games_finished": sum(client["result"] is not None for client in clients) // 2,
+        "moves": len(sent),
+        "moves_per_second": len(sent) / move_time if move_time > 0 else 0.,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies, default=0.)
+        },
+        "errors": sum(client["errors"] for client in clients),
+        "disconnected": sum(client["disconnected"] for client in clients),
+        "failed": sum(client["failure"] is not None for client in clients)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load tests the game server with simulated clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--clients", type=int, default=1000, help="Number of clients, two per game")
+    parser.add_argument("--processes", type=int, default=1, help="Processes to run the clients in")
+    parser.add_argument("--connect-rate", type=float, default=1000., help="New connections per second")
+    parser.add_argument("--move-rate", type=float, default=1., help="Moves per second by each client, 0 for no wait")
+    parser.add_argument("--max-plies", type=int, default=100, help="Plies after which the side to move resigns")
+    parser.add_argument("--logs", nargs="*", default=None, help="Play the moves of these logged games")
+    parser.add_argument("--scripts", type=int, default=1000, help="Most logged games to load")
+    parser.add_argument("--json", default=None, help="File to write the summary to")
+    args = parser.parse_args()
+
+    scripts = load_scripts(args.logs, args.scripts) if args.logs else []
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "scripts": scripts,
+        "connect_rate": args.connect_rate / args.processes,
+        "move_interval": 1 / args.move_rate if args.move_rate > 0 else 0.,
+        "max_plies": args.max_plies
+    }
+
+    # Names are unique across processes, since latency is matched up by opponent name
+    tasks = [([f"load{process}-{i}" for i in range(process, args.clients, args.processes)], options)
+             for process in range(args.processes)]
+
+    start = time.monotonic()
+    with Pool(args.processes) as pool:
+        clients = [client for process_clients in pool.map(run_process, tasks) for client in process_clients]
+
+    summary = summarize(clients, start)
+    latency = summary["latency_ms"]
+    print(f"{summary['connected']}/{summary['clients']} clients connected at "
+          f"{summary['connections_per_second']:.0f}/s (p95 connect {summary['connect_time_p95_ms']:.1f} ms), "
+          f"{summary['games_finished']} games finished")
+    print(f"{summary['moves']} moves at {summary['moves_per_second']:.0f}/s, "
+          f"relay latency p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f}, p99 {latency['p99']:.2f}, max {latency['max']:.2f}")
+    print(f"{summary['errors']} errors, {summary['disconnected']} disconnected, {summary['failed']} failed")
+    for failure in sorted({client["failure"] for client in clients if client["failure"] is not None}):
+        print(f"  {failure}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,33 @@
+import time
+startup_start = time.perf_counter()  # Taken before the other imports, so the startup report includes them
+
+import argparse
 import pygame
 from pygame.locals import *
 import os
 import sys
 from math import sqrt
-import time
 
 from piece import Piece, create_piece
-from utilities import draw_regular_polygon, clamp
-from board import Board, Tile
-from components import Button, Label, Dropdown, Slider, RGBPicker
+from utilities import draw_regular_polygon, clamp, rebuild_sprite_cache
+from board import Board, Tile, get_piece_scale
+from components import Button, Label, Dropdown, Slider, RGBPicker, ComponentGroup, ProfilerOverlay, MoveHistory
 from settings import Settings
-from axial import Axial, axial_from_string, pixel_to_axial
+from axial import Axial, axial_from_string
 from event_handler import EventHandler
+from scheduler import create_scheduler
+from evaluation import load_weights
+from profiler import mark_startup, startup_report
+from game_log import iter_games
+from itertools import islice
+
+mark_startup("imports")
+show_startup_report = False
+server_address = ("127.0.0.1", 12345)
+player_name = ""
+
+# Posted by the network thread, so a screen waiting for input wakes up when a message arrives
+NETWORK_EVENT = pygame.event.custom_type()
 
 
 def main_menu() -> None:
@@ -23,7 +39,9 @@ def main_menu() -> None:
     """
 
     settings = Settings("settings.pkl")
+    mark_startup("settings")
     screen = pygame.display.set_mode(settings.dimensions)
+    mark_startup("display")
 
     title_font_size = int(settings.dimensions[1] / 100) * 8
     button_font = pygame.font.Font(None, title_font_size // 2)
@@ -35,19 +53,27 @@ def main_menu() -> None:
 
     buttons = [
         Button(x, y, text_width, 50, "Play Game"),
-        Button(x, y + 125, text_width, 50, "Test Mode"),
-        Button(x, y + 250, text_width, 50, "Settings"),
-        Button(x, y + 375, text_width, 50, "Quit Game"),
+        Button(x, y + 100, text_width, 50, "Play Online"),
+        Button(x, y + 200, text_width, 50, "Test Mode"),
+        Button(x, y + 300, text_width, 50, "Settings"),
+        Button(x, y + 400, text_width, 50, "Quit Game"),
     ]
     title = Label(x, 25, text_width, 50, "Hexagonal Chess")
 
+    components = ComponentGroup(pygame.Color('grey'))
+    for button in buttons:
+        components.add(button, button_font, settings.text_color)
+    components.add(title, title_font, settings.text_color)
+
+    scheduler = create_scheduler()
     running = True
 
     while running:
-        for event in pygame.event.get():
+        for event in scheduler.get_events():
             if event.type == QUIT:
                 running = False
             elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+                scheduler.invalidate()
                 mouse_pos = pygame.mouse.get_pos()
                 for button in buttons:
                     if button.is_clicked(mouse_pos):
@@ -63,23 +89,30 @@ def main_menu() -> None:
 
                                     for i, component in enumerate(buttons):
                                         component.rect.x = x
-                                        component.rect.y = y + 125 * i
+                                        component.rect.y = y + 100 * i
 
                                     title.rect.x = x
 
+                                for button in buttons:
+                                    components.set_args(button, button_font, settings.text_color)
+                                components.set_args(title, title_font, settings.text_color)
+
                             case "Play Game":
                                 game_loop(settings)
+                            case "Play Online":
+                                play_online(settings)
                             case "Test Mode":
                                 test_mode(settings)
 
-        screen.fill(pygame.Color('grey'))
+        if not running or not scheduler.should_render():
+            continue
 
-        for button in buttons:
-            button.draw(screen, button_font, settings.text_color)
+        # Other screens draw over the whole window, so the menu is repainted after every click
+        components.invalidate()
+        pygame.display.update(components.draw(screen))
 
-        title.draw(screen, title_font, settings.text_color)
-
-        pygame.display.flip()
+        if mark_startup("menu frame") and show_startup_report:
+            print(startup_report(startup_start))
 
 
 def settings_menu(screen: pygame.surface.Surface, settings: Settings) -> bool:
@@ -135,14 +168,26 @@ def settings_menu(screen: pygame.surface.Surface, settings: Settings) -> bool:
                      clamp(-60, occupied_tile_sample.color.b, 255))
     occupied_tile_sample.apply_filter(pygame.Color(occupied_color[0], occupied_color[1], occupied_color[2]))
 
+    components = ComponentGroup(pygame.Color("grey"))
+    components.add(dropdown_label)
+    components.add(dropdown)
+    for button in buttons:
+        components.add(button)
+    components.add(highlight_color_label)
+    components.add(highlight_rgb_picker, font, pygame.Color('grey'), pygame.Color('white'))
+    components.add(text_color_label)
+    components.add(text_rgb_picker, font, pygame.Color('grey'), pygame.Color('white'))
+
     dragging_slider = None
+    scheduler = create_scheduler()
 
     while True:
-        for event in pygame.event.get():
+        for event in scheduler.get_events():
             if event.type == QUIT:
                 pygame.quit()
                 sys.exit()
             elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+                scheduler.invalidate()
                 mouse_pos = pygame.mouse.get_pos()
 
                 if dropdown.rect.collidepoint(mouse_pos):
@@ -170,6 +215,7 @@ def settings_menu(screen: pygame.surface.Surface, settings: Settings) -> bool:
                                 settings.dimensions = new_dimensions
                                 settings.text_color = new_text_color
                                 pygame.display.set_mode(new_dimensions)
+                                rebuild_sprite_cache(get_piece_scale(new_dimensions))
 
                                 settings.save_settings()
                                 return True
@@ -184,48 +230,115 @@ def settings_menu(screen: pygame.surface.Surface, settings: Settings) -> bool:
             elif event.type == MOUSEBUTTONUP and event.button == 1:
                 dragging_slider = None
             elif event.type == MOUSEMOTION and dragging_slider:
+                scheduler.invalidate()
                 mouse_pos = pygame.mouse.get_pos()
                 dragging_slider.update_value(mouse_pos[0])
 
+        scheduler.animating = dragging_slider is not None
+        if not scheduler.should_render():
+            continue
 
-        screen.fill(pygame.Color("grey"))
-        text_rgb_picker.update_color()
-        dropdown_label.draw(screen, font, pygame.Color(text_rgb_picker.color))
-        dropdown.draw(screen, font, pygame.Color(180, 180, 180), pygame.Color(text_rgb_picker.color))
+        if scheduler.exposed:
+            components.invalidate()
 
-        for button in buttons:
-            button.draw(screen, font, pygame.Color(text_rgb_picker.color))
+        # Only components whose text colour or state changed are drawn again
+        text_rgb_picker.update_color()
+        text_color = pygame.Color(text_rgb_picker.color)
+        for component in [dropdown_label, highlight_color_label, text_color_label] + buttons:
+            components.set_args(component, font, text_color)
+        components.set_args(dropdown, font, pygame.Color(180, 180, 180), text_color)
 
-        highlight_color_label.draw(screen, font, pygame.Color(text_rgb_picker.color))
-        highlight_rgb_picker.draw(screen, font, pygame.Color('grey'), pygame.Color('white'))
-        text_color_label.draw(screen, font, pygame.Color(text_rgb_picker.color))
-        text_rgb_picker.draw(screen, font, pygame.Color('grey'), pygame.Color('white'))
+        dirty_rects = components.draw(screen)
 
+        highlight_rgb_picker.update_color()
+        highlight = highlight_rgb_picker.color
         for tile in sample_tiles:
+            if tile != sample_tiles[-1]:
+                new_color = (clamp(tile.color.r, highlight[0], 255),
+                             clamp(tile.color.g, highlight[1], 255),
+                             clamp(tile.color.b, highlight[2], 255))
+                tile.apply_filter(pygame.Color(new_color[0], new_color[1], new_color[2]))
+
             tile.draw_tile(screen)
+            dirty_rects.append(tile.rect)
 
-            if tile == sample_tiles[-1]:
-                break
+        pygame.display.update(dirty_rects)
+
+
+def create_move_history(board: Board, settings: Settings) -> MoveHistory:
+    # The panel fills the space right of the board, below the promotion labels
+    x = max(tile.rect.right for tile in board.tiles.values()) + 5
+    return MoveHistory(x, 160, settings.dimensions[0] - x - 5, settings.dimensions[1] - 170,
+                       pygame.font.Font(None, 20), settings.text_color, pygame.Color('grey'),
+                       pygame.Color('lightgrey'))
+
+
+def handle_move_history_event(event: pygame.event.Event, history: MoveHistory, board: Board):
+    if event.type == MOUSEWHEEL and history.rect.collidepoint(pygame.mouse.get_pos()):
+        history.scroll(-event.y * 3)
+    elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+        ply = history.row_at(event.pos)
+        if ply is not None:
+            board.seek(ply + 1)
+
+
+def update_move_history(history: MoveHistory, board: Board):
+    # The panel is drawn into the board background, so the board repaints it wherever pieces move over it
+    history.set_moves(board.state)
+    history.set_selected(board.review_ply - 1 if board.review_ply else None)
+    if history.dirty:
+        board.invalidate(history.draw(board.background))
+
+
+def clock_text(milliseconds: float) -> str:
+    seconds = max(int(milliseconds) // 1000, 0)
+    return f"{seconds // 60}:{seconds % 60:02}"
+
+
+def online_status(client, board: Board) -> str:
+    if board.player_color is None:
+        return "Waiting for an opponent" if client.connected else "Connecting..."
+
+    color = "white" if board.player_color == 1 else "black"
+    return f"Your turn ({color})" if board.turn == board.player_color else f"Their turn ({color})"
+
+
+def online_result_text(result: (float, int), color: int | None, closed_reason: str | None) -> (bool, str):
+    if result is None:
+        return False, closed_reason or "Connection closed"
 
-            highlight_rgb_picker.update_color()
-            highlight = highlight_rgb_picker.color
-            new_color = (clamp(tile.color.r, highlight[0], 255),
-                         clamp(tile.color.g, highlight[1], 255),
-                         clamp(tile.color.b, highlight[2], 255))
-            tile.apply_filter(pygame.Color(new_color[0], new_color[1], new_color[2]))
+    from protocol import reasons
 
-        pygame.display.flip()
+    score = result[0] if color == 1 else 1 - result[0]
+    text = "You win!" if score == 1 else "You lost..." if score == 0 else "Draw"
+    return score == 1, f"{text} ({reasons[result[1]]})"
 
 
-def game_loop(settings: Settings) -> None:
+def play_online(settings: Settings) -> None:
+    from client import NetworkClient  # Imported here, so offline games do not pay for importing asyncio
+
+    client = NetworkClient(*server_address, player_name,
+                           wake=lambda: pygame.event.post(pygame.event.Event(NETWORK_EVENT)))
+    client.start()
+    game_loop(settings, client=client)
+
+
+def game_loop(settings: Settings, state: list[str] = None, client=None) -> None:
     """
-    Main game loop
+    Main game loop. The left and right arrow keys step back and forward through the moves played, and home and end
+    jump to the start and the current position.
+
+    With a client, the game is played against an opponent on the server. The client does its network I/O on its own
+    thread, and the loop only polls it once a frame, so the board stays responsive while waiting for the opponent or a
+    slow connection.
 
+    :param state: ICCF moves to continue the game from
+    :param client: A started client.NetworkClient connected to the game server
     :return: None
     """
 
     screen = pygame.display.set_mode(settings.dimensions)
-    clock = pygame.time.Clock()
+    scheduler = create_scheduler()
 
     board = Board(screen, settings)
 
@@ -239,49 +352,160 @@ def game_loop(settings: Settings) -> None:
         Label(settings.dimensions[0] * 3 / 4 - 75, 75, 200, 50, "r - Rook"),
         Label(settings.dimensions[0] * 3 / 4 - 75, 100, 200, 50, "b - Bishop")
     ]
+    clock_labels = [
+        Label(settings.dimensions[0] / 4 - 100, 0, 200, 50, ""),
+        Label(settings.dimensions[0] / 4 - 100, 25, 200, 50, "")
+    ]
 
     board.start_game()
+    if state:
+        board.load_state(state, trusted=True)
     # sample_state = ['09010703', '06070606', '07040706', '06060705', '07030705', '07070706', '07050706', '07100808',
     #                 '05040506', '04070406', '06030504', '03080707', '05010204', '02070206', '02040510', '02060205',
     #                 '05100409', '03070306', '04090611', '03060305', '06110610']
 
     # board.load_state(sample_state)
 
+    labels_state = None
+    overlay = ProfilerOverlay(0, 0, pygame.font.Font(None, 20), pygame.Color('white'))
+    history = create_move_history(board, settings)
+
+    # What the server has told the client, how many moves the server knows about, and the ply of the move sent to it
+    # that it may still refuse
+    clocks = None
+    clocks_received = 0.
+    result = None
+    closed_reason = None
+    synced_plies = len(board.timeline)
+    unconfirmed_ply = None
+    if client is not None:
+        from client import CLOSED
+        from protocol import COLOR, MOVE, CLOCK, RESULT, ERROR
+
     try:
         while True:
-            events = pygame.event.get()
+            events = scheduler.get_events()
+
+            if client is not None:
+                for message_type, value in client.poll():
+                    if message_type == COLOR:
+                        board.player_color = value[0]
+                    elif message_type == MOVE:
+                        board.play_move(value)
+                        synced_plies = len(board.timeline)
+                        unconfirmed_ply = None
+                    elif message_type == CLOCK:
+                        # The server only sends the clocks after accepting a move
+                        clocks = value
+                        clocks_received = time.monotonic()
+                        unconfirmed_ply = None
+                    elif message_type == RESULT:
+                        result = value
+                    elif message_type == ERROR:
+                        print(f"Server: {value}")
+                        if unconfirmed_ply is not None:
+                            # The only move the server can refuse is the last one sent, so the boards agree again
+                            # once it is taken back
+                            board.take_back(unconfirmed_ply)
+                            synced_plies = unconfirmed_ply
+                            unconfirmed_ply = None
+                    elif message_type == CLOSED:
+                        closed_reason = value
+
+                if client.closed:
+                    is_winner, text = online_result_text(result, board.player_color, closed_reason)
+                    game_over_screen(is_winner, settings, text)
+                    print(board.state)
+                    break
+
             for event in events:
                 if event.type == QUIT:
                     print(board.state)
+                    if client is not None:
+                        client.close()
                     pygame.quit()
                     sys.exit()
-
-            screen.fill(pygame.Color('grey'))
-
-            turn_label.draw(screen, font, settings.text_color)
-
-            if board.promotion_flag:
-                for label in promotion_labels:
-                    label.draw(screen, font, settings.text_color)
-
-            board.update(events)
-
-            if board.turn == 0:
-                turn_label.set_text("Black's turn")
+                elif event.type == KEYDOWN and event.key == K_F3:
+                    covered = overlay.toggle()
+                    if covered is not None:
+                        board.invalidate(covered)
+                elif event.type in (MOUSEWHEEL, MOUSEBUTTONDOWN):
+                    handle_move_history_event(event, history, board)
+                elif event.type == KEYDOWN and event.key in (K_LEFT, K_RIGHT, K_HOME, K_END):
+                    ply = board.review_ply if board.review_ply is not None else len(board.timeline)
+                    match event.key:
+                        case pygame.K_LEFT:
+                            board.seek(ply - 1)
+                        case pygame.K_RIGHT:
+                            board.seek(ply + 1)
+                        case pygame.K_HOME:
+                            board.seek(0)
+                        case pygame.K_END:
+                            board.seek(len(board.timeline))
+
+            if scheduler.should_render():  # First frame, or the window was exposed
+                board.invalidate()
+
+            if board.review_ply is not None:
+                turn_text = f"Move {board.review_ply} of {len(board.timeline)}"
+            elif client is not None:
+                turn_text = online_status(client, board)
             else:
-                turn_label.set_text("White's turn")
-
-            if board.game_over:
+                turn_text = "Black's turn" if board.turn == 0 else "White's turn"
+
+            clock_texts = ()
+            if clocks is not None:
+                white_ms, black_ms = clocks
+                if result is None:  # The clock of the side to move runs down from the time the server last sent
+                    elapsed = (time.monotonic() - clocks_received) * 1000
+                    if len(board.timeline) % 2 == 0:
+                        white_ms -= elapsed
+                    else:
+                        black_ms -= elapsed
+                clock_texts = (f"White {clock_text(white_ms)}", f"Black {clock_text(black_ms)}")
+
+            # The labels only change with the turn, so they are drawn into the board background instead of every frame
+            if labels_state != (turn_text, clock_texts, board.promotion_flag):
+                labels_state = (turn_text, clock_texts, board.promotion_flag)
+                turn_label.set_text(turn_text)
+
+                board.reset_background()
+                history.dirty = True
+                turn_label.draw(board.background, font, settings.text_color)
+                for label, text in zip(clock_labels, clock_texts):
+                    label.set_text(text)
+                    label.draw(board.background, font, settings.text_color)
+                if board.promotion_flag:
+                    for label in promotion_labels:
+                        label.draw(board.background, font, settings.text_color)
+
+            update_move_history(history, board)
+            dirty_rects = board.update(events)
+            dirty_rects.extend(overlay.draw(screen, dirty_rects))
+            scheduler.animating = board.piece_selected is not None
+
+            if client is not None and len(board.timeline) > synced_plies:
+                unconfirmed_ply = synced_plies
+                for move in board.timeline.moves[synced_plies:]:
+                    client.send_move(move)
+                synced_plies = len(board.timeline)
+
+            # A networked game is over when the server says so
+            if board.game_over and client is None:
                 # Replace bool with whether we win according to the last piece played color being ours or enemy
                 game_over_screen(True, settings)
                 print(board.state)
                 break
 
-            pygame.display.flip()
+            pygame.display.update(dirty_rects)
 
-            clock.tick(60)
+            if mark_startup("board frame") and show_startup_report:
+                print(startup_report(startup_start))
     except ValueError:
         print(board.state)
+    finally:
+        if client is not None:
+            client.close()
 
 
 def test_mode(settings: Settings) -> None:
@@ -304,21 +528,34 @@ def test_mode(settings: Settings) -> None:
 
     running = True
     key_last_pressed = 0.
+    promotion_flag = False
+    scheduler = create_scheduler()
+    overlay = ProfilerOverlay(0, 0, pygame.font.Font(None, 20), pygame.Color('white'))
+    history = create_move_history(board, settings)
     while running:
-        events = pygame.event.get()
+        events = scheduler.get_events()
         keys = pygame.key.get_pressed()
 
         for event in events:
             if event.type == QUIT:
                 pygame.quit()
                 sys.exit()
+            elif event.type == KEYDOWN and event.key == K_F3:
+                covered = overlay.toggle()
+                if covered is not None:
+                    board.invalidate(covered)
+            elif event.type in (MOUSEWHEEL, MOUSEBUTTONDOWN):
+                handle_move_history_event(event, history, board)
+
+        if scheduler.should_render():  # First frame, or the window was exposed
+            board.invalidate()
 
         piece_color = 1
         if keys[K_LSHIFT] or keys[K_RSHIFT]:
             piece_color = 0
 
         if time.time() - key_last_pressed > 0.25:
-            tile = board.tiles.get(pixel_to_axial(board, pygame.mouse.get_pos()).to_string())
+            tile = board.tile_at(pygame.mouse.get_pos())
             if tile is not None:
                 if tile.piece is None:
                     if keys[K_p]:
@@ -346,34 +583,39 @@ def test_mode(settings: Settings) -> None:
                         board.add_piece(piece)
                         key_last_pressed = time.time()
                 if keys[K_BACKSPACE]:
-                    mouse_axial = pixel_to_axial(board, pygame.mouse.get_pos())
-                    hovered_piece = board.tiles.get(mouse_axial.to_string()).piece
+                    hovered_piece = board.piece_at(pygame.mouse.get_pos())
                     if hovered_piece is not None:
                         board.remove_piece(hovered_piece)
                     key_last_pressed = time.time()
 
-        screen.fill(pygame.Color('grey'))
-
-        if board.promotion_flag:
-            for label in promotion_labels:
-                label.draw(screen, font, settings.text_color)
+        if promotion_flag != board.promotion_flag:
+            promotion_flag = board.promotion_flag
+            board.reset_background()
+            history.dirty = True
+            if promotion_flag:
+                for label in promotion_labels:
+                    label.draw(board.background, font, settings.text_color)
 
         if board.game_over:
             # Replace bool with whether we win according to the last piece played color being ours or enemy
             game_over_screen(True, settings)
             break
 
-        board.update(events)
-        pygame.display.flip()
+        update_move_history(history, board)
+        dirty_rects = board.update(events)
+        dirty_rects.extend(overlay.draw(screen, dirty_rects))
+        pygame.display.update(dirty_rects)
+        scheduler.animating = board.piece_selected is not None
+
+        if mark_startup("board frame") and show_startup_report:
+            print(startup_report(startup_start))
 
 
-def game_over_screen(is_winner: bool, settings: Settings):
+def game_over_screen(is_winner: bool, settings: Settings, text: str = None):
     screen = pygame.display.set_mode(settings.dimensions)
 
-    if is_winner:
-        text = "You win!"
-    else:
-        text = "You lost..."
+    if text is None:
+        text = "You win!" if is_winner else "You lost..."
 
     font = pygame.font.Font(None, 36)
 
@@ -381,9 +623,14 @@ def game_over_screen(is_winner: bool, settings: Settings):
     main_menu_button = Button(settings.dimensions[0] / 2 - 100, settings.dimensions[1] - 200, 200, 50,
                               "Main Menu")
 
+    components = ComponentGroup(pygame.Color('grey'))
+    components.add(end_state, font, settings.text_color)
+    components.add(main_menu_button, font, settings.text_color)
+
+    scheduler = create_scheduler()
     running = True
     while running:
-        events = pygame.event.get()
+        events = scheduler.get_events()
         mouse_pos = pygame.mouse.get_pos()
         for event in events:
             if event.type == QUIT:
@@ -393,19 +640,44 @@ def game_over_screen(is_winner: bool, settings: Settings):
                 if main_menu_button.is_clicked(mouse_pos):
                     running = False
 
-        screen.fill(pygame.Color('grey'))
-
-        end_state.draw(screen, font, settings.text_color)
-        main_menu_button.draw(screen, font, settings.text_color)
+        if not running or not scheduler.should_render():
+            continue
 
-        pygame.display.flip()
+        if scheduler.exposed:
+            components.invalidate()
+        pygame.display.update(components.draw(screen))
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gliński's hexagonal chess")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print how long startup took once the menu and the first board are shown")
+    parser.add_argument("--review", default=None, help="Game log to open a game from, skipping the menu")
+    parser.add_argument("--game", type=int, default=0, help="Index of the game in the log to open")
+    parser.add_argument("--server", default="127.0.0.1:12345", help="Host and port of the server to play online on")
+    parser.add_argument("--name", default="", help="Name to play online as, the server uses your address if empty")
+    args = parser.parse_args()
+    show_startup_report = args.startup_report
+
+    host, _, port = args.server.rpartition(":")
+    if not host or not port.isdigit():
+        parser.error(f"--server should be host:port, not {args.server}")
+    server_address = (host, int(port))
+    player_name = args.name
+
     pygame.init()
     pygame.display.set_caption("Hexagonal Chess")
+    load_weights()
+    mark_startup("init")
+
+    if args.review is not None:
+        game = next(islice(iter_games([args.review]), args.game, None), None)
+        if game is None:
+            parser.error(f"{args.review} has no game {args.game}")
 
-    main_menu()
+        game_loop(Settings("settings.pkl"), game[0])
+    else:
+        main_menu()
 
     pygame.quit()
     sys.exit()
@@ -414,23 +686,9 @@ if __name__ == '__main__':
 TODO
  - Add some form of notation to the board with save and load methods for placing the the pieces.
  
- - Add server and client.
-   - Server stores client information, the IP gets mapped to the users name in the settings. If left as default, then
-   auto-assign the name of the IP. The server would tell each client what color it is, and when the client sends their
-   board state (the current state in the notation) the server will save the state to logs, update the turn, then send 
-   the board state to the other client. The server should then check if the board state was terminal, and if so it will
-   close the connection to the clients.
-    - Optional features when closing connection could be sending the players match history W-L
-    
-   - Client will play the game. It will have the option to play local which is the default game we have made, then a 
-   second button will be on the main menu for multiplayer. Once the client clicks multiplayer, it will have an input for
-   an IP and a port, and a connect button. Once the user enters the IP and port, if it fails to connect it will display
-   a red label saying connection failed. If it does connect, it will instead get the players color from the server and 
-   orient the board accordingly. When its the players turn they can play their move and it will get sent to the server.
-   Once their turn is done, the client will wait for the server to respond with the next move and will display the other
-   players turn.
+ - Add inputs for the server address and player name to the main menu, in place of --server and --name. If it fails to
+   connect it should display a red label saying connection failed, instead of the game over screen.
  
- - Add which color you are to the game screen (Low priority since it makes no difference until multiplayer is implemented)
  - Add the ability to see from black perspective (Low priority since moving works as is)
  - Refactor the code (at the end)
 '''
\ No newline at end of file
@@ -0,0 +1,181 @@
+import argparse
+import pygame
+import sys
+import time
+from math import ceil, sqrt
+from pygame.locals import *
+from board import Board
+from engine import Search
+from evaluation import load_weights
+from game_log import iter_games
+from rules import starting_position, move_from_iccf
+from scheduler import FrameScheduler
+from settings import Settings
+
+
+class MultiBoardView:
+    """
+
+    Tiles several boards on one screen. Each board draws into its own subsurface at a smaller scale, and boards of the
+    same size share their background and piece sprites. Only boards whose position changed are redrawn.
+
+    """
+
+    def __init__(self, screen: pygame.Surface, settings: Settings, count: int, columns: int = None):
+        self.screen = screen
+        self.columns = columns if columns is not None else ceil(sqrt(count))
+        rows = ceil(count / self.columns)
+        width, height = screen.get_size()
+        cell_size = min(width // self.columns, height // rows)
+
+        self.boards: list[Board] = []
+        self.offsets: list[(int, int)] = []
+
+        for i in range(count):
+            rect = pygame.Rect(i % self.columns * cell_size, i // self.columns * cell_size, cell_size, cell_size)
+            board = Board(screen.subsurface(rect), settings, dimensions=(cell_size, cell_size))
+            board.generate_blank_board()
+            board.set_position(starting_position())
+
+            self.boards.append(board)
+            self.offsets.append(rect.topleft)
+
+        self.redraw_all = True
+
+    def show(self, index: int, position, last_move: (int, int, int) = None):
+        self.boards[index].set_position(position, last_move)
+
+    def invalidate(self):
+        self.redraw_all = True
+
+    def draw(self) -> list[pygame.Rect]:
+        """
+
+        :return: The screen areas that changed, for pygame.display.update
+        """
+
+        if self.redraw_all:
+            self.redraw_all = False
+            self.screen.fill(pygame.Color('grey'))
+            for board in self.boards:
+                board.invalidate()
+
+        dirty_rects = []
+        for board, offset in zip(self.boards, self.offsets):
+            dirty_rects.extend(rect.move(offset) for rect in board.update_board())
+
+        return dirty_rects
+
+
+class SelfPlayGames:
+    """
+
+    Engine games played one move at a time, restarting each game when it ends
+
+    """
+
+    def __init__(self, count: int, nodes: int, max_plies: int):
+        self.search = Search(1 << 16)
+        self.nodes = nodes
+        self.max_plies = max_plies
+        self.positions = [starting_position() for _ in range(count)]
+
+    def advance(self, index: int) -> (object, (int, int, int)):
+        position = self.positions[index]
+
+        if position.result() is not None or position.ply >= self.max_plies:
+            self.positions[index] = starting_position()
+            return self.positions[index], None
+
+        move, _ = self.search.search(position, nodes=self.nodes)
+        position.apply(move)
+        return position, move
+
+
+class ReplayedGames:
+    """
+
+    Logged games replayed one move at a time. Each board takes the next game from the logs when its game ends.
+
+    """
+
+    def __init__(self, count: int, paths: list[str]):
+        self.games = iter_games(paths)
+        self.positions = [starting_position() for _ in range(count)]
+        self.moves: list[list[str]] = [[] for _ in range(count)]
+        for index in range(count):
+            self.next_game(index)
+
+    def next_game(self, index: int):
+        game = next(self.games, None)
+        if game is not None:
+            self.positions[index] = starting_position()
+            self.moves[index] = list(reversed(game[0]))
+
+    def advance(self, index: int) -> (object, (int, int, int)):
+        if not self.moves[index]:
+            self.next_game(index)
+            return self.positions[index], None
+
+        move = move_from_iccf(self.moves[index].pop())
+        self.positions[index].apply(move)
+        return self.positions[index], move
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Watches many games at once")
+    parser.add_argument("--games", type=int, default=16, help="Number of boards")
+    parser.add_argument("--logs", nargs="*", default=None, help="Replay games from these logs instead of self-play")
+    parser.add_argument("--nodes", type=int, default=200, help="Nodes per move in self-play")
+    parser.add_argument("--max-plies", type=int, default=300)
+    parser.add_argument("--move-interval", type=int, default=250, help="Milliseconds between moves on a board")
+    parser.add_argument("--size", type=int, default=None, help="Window size, defaults to the settings")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_caption("Hexagonal Chess")
+    load_weights()
+
+    settings = Settings("settings.pkl")
+    size = (args.size, args.size) if args.size is not None else settings.dimensions
+    screen = pygame.display.set_mode(size)
+
+    view = MultiBoardView(screen, settings, args.games)
+    if args.logs:
+        games = ReplayedGames(args.games, args.logs)
+    else:
+        games = SelfPlayGames(args.games, args.nodes, args.max_plies)
+
+    scheduler = FrameScheduler(30)
+    scheduler.animating = True
+    next_board = 0
+    next_move_time = [0.] * args.games
+
+    while True:
+        for event in scheduler.get_events():
+            if event.type == QUIT:
+                pygame.quit()
+                sys.exit()
+
+        if scheduler.should_render():
+            view.invalidate()
+
+        # Boards take turns, so one frame never waits on more than a move per board
+        frame_start = time.time()
+        for _ in range(args.games):
+            index = next_board
+            next_board = (next_board + 1) % args.games
+
+            if frame_start >= next_move_time[index]:
+                position, move = games.advance(index)
+                view.show(index, position, move)
+                next_move_time[index] = frame_start + args.move_interval / 1000
+
+            if time.time() - frame_start > 1 / scheduler.fps:
+                break
+
+        pygame.display.update(view.draw())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,11 @@
 import pygame
 from utilities import get_piece_image, position_to_cartesian, position_to_file_and_rank
-from axial import position_to_axial, Axial, pixel_to_axial, axial_from_string
+from axial import position_to_axial, Axial, axial_from_string
 from pygame.locals import *
 from abc import abstractmethod, ABC
 from copy import copy
-
-positions = {
-    "0queen": "e10",
-    "0king": "g10",
-    "0bishop": ["f11", "f10", "f9"],
-    "0knight": ["d9", "h9"],
-    "0rook": ["c8", "i8"],
-    "0pawn": ["b7", "c7", "d7", "e7", "f7", "g7", "h7", "i7", "j7"],
-    "1queen": "e1",
-    "1king": "g1",
-    "1bishop": ["f1", "f2", "f3"],
-    "1knight": ["d1", "h1"],
-    "1rook": ["c1", "i1"],
-    "1pawn": ["b1", "c2", "d3", "e4", "f5", "g4", "h3", "i2", "j1"]
-}
+from rules import positions
+from profiler import count
 
 
 class Piece(pygame.sprite.Sprite, ABC):
@@ -51,10 +38,9 @@ class Piece(pygame.sprite.Sprite, ABC):
         if self.dragging:
             self.rect.center = pygame.mouse.get_pos()
 
-            for axial, tile in tiles.items():
-                if pixel_to_axial(self.board, self.rect.center) == axial:
-                    self.current_position = tile.position
-                    break
+            tile = self.board.tile_at(self.rect.center)
+            if tile is not None:
+                self.current_position = tile.position
 
     def mouse_button_down_handler(self, event: pygame.event.Event):
         if self.rect.collidepoint(event.pos):
@@ -63,19 +49,14 @@ class Piece(pygame.sprite.Sprite, ABC):
             return self
 
     def mouse_button_up_handler(self, event: pygame.event.Event) -> bool:
-        tiles = self.board.tiles
-
         if self.dragging:
-            found_tile = None
+            found_tile = False
+            tile = self.board.tile_at(self.rect.center)
 
-            for tile_axial, tile in tiles.items():
-                if (pixel_to_axial(self.board, self.rect.center).to_string() == tile_axial and
-                        (tile in self.board.highlighted_tiles or self.board.test_mode) and
-                        tile.position != self.previous_position):
-
-                    self.board.move_piece(tile, self)
-                    found_tile = True
-                    break
+            if (tile is not None and (tile in self.board.highlighted_tiles or self.board.test_mode) and
+                    tile.position != self.previous_position):
+                self.board.move_piece(tile, self)
+                found_tile = True
 
             if not found_tile:
                 self.current_position = self.previous_position
@@ -94,6 +75,7 @@ class Piece(pygame.sprite.Sprite, ABC):
         return True
 
     def configure_copy(self, piece_copy):
+        count("deep_copies")
         piece_copy.dragging = copy(self.dragging)
         piece_copy.previous_position = copy(self.previous_position)
         piece_copy.current_position = copy(self.current_position)
@@ -177,16 +159,11 @@ class Pawn(Piece):
 
         return legal_moves
 
-    def mouse_button_up_handler(self, event: pygame.event.Event) -> bool:
-        valid_move = super().mouse_button_up_handler(event)
-
-        if valid_move:
-            axial = position_to_axial(self.current_position)
-            axial.r = axial.r - 1
-            if self.board.tiles.get(axial.to_string()) is None:
-                self.board.promote_pawn()
-
-        return valid_move
+    def on_last_rank(self) -> bool:
+        # White pawns move towards lower r and black pawns towards higher r
+        axial = position_to_axial(self.current_position)
+        axial.r = axial.r - 1 if self.color == 1 else axial.r + 1
+        return self.board.tiles.get(axial.to_string()) is None
 
     def __deepcopy__(self, memodict=None, piece_copy=None):
         if memodict is None:
@@ -0,0 +1,172 @@
+from collections import Counter, defaultdict, deque
+from functools import wraps
+from time import perf_counter
+
+
+class Profiler:
+    """
+
+    Collects how long each instrumented section takes and how often counted things happen, per frame. While disabled,
+    instrumented code only pays for checking the enabled flag. Section times are inclusive, so a section that runs
+    inside another is counted in both.
+
+    """
+
+    def __init__(self, history=600, trace_limit=200000):
+        self.enabled = False
+        self.frames = deque(maxlen=history)
+        self.trace = deque(maxlen=trace_limit)
+        self.origin = perf_counter()
+        self.frame_start = None
+        self.sections = defaultdict(float)
+        self.counters = Counter()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+
+        self.frame_start = perf_counter()
+        self.sections = defaultdict(float)
+        self.counters = Counter()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+
+        end = perf_counter()
+        self.frames.append({
+            "start": self.frame_start - self.origin,
+            "time": end - self.frame_start,
+            "sections": dict(self.sections),
+            "counters": dict(self.counters)
+        })
+        self.trace.append(("frame", self.frame_start, end))
+        self.frame_start = None
+
+    def add_span(self, name: str, start: float, end: float):
+        self.sections[name] += end - start
+        self.trace.append((name, start, end))
+
+    def set_history(self, history: int = None):
+        # None keeps every frame, for reports over a whole run
+        self.frames = deque(self.frames, maxlen=history)
+
+    def clear(self):
+        self.frames.clear()
+        self.trace.clear()
+        self.frame_start = None
+
+    def summary(self, last: int = None) -> dict:
+        """
+
+        :param last: Only summarise this many of the latest frames
+        :return: Mean and worst frame times and section times in milliseconds, and counts per frame
+        """
+
+        frames = list(self.frames)[-last:] if last else list(self.frames)
+        frame_count = max(len(frames), 1)
+        times = sorted(frame["time"] * 1000 for frame in frames)
+        sections = defaultdict(float)
+        counters = Counter()
+        worst_counters = Counter()
+
+        for frame in frames:
+            for name, time in frame["sections"].items():
+                sections[name] += time * 1000
+            for name, count in frame["counters"].items():
+                counters[name] += count
+                worst_counters[name] = max(worst_counters[name], count)
+
+        return {
+            "frames": len(frames),
+            "frame_time": {
+                "mean": sum(times) / frame_count,
+                "p95": times[min(int(0.95 * len(times)), len(times) - 1)] if times else 0.,
+                "max": times[-1] if times else 0.
+            },
+            "sections": {name: total / frame_count for name, total in sorted(sections.items())},
+            "counters": {name: {"mean": total / frame_count, "max": worst_counters[name]}
+                         for name, total in sorted(counters.items())}
+        }
+
+    def chrome_trace(self) -> dict:
+        # Complete events in microseconds, for chrome://tracing or Perfetto
+        return {
+            "traceEvents": [
+                {"name": name, "ph": "X", "pid": 1, "tid": 1, "ts": (start - self.origin) * 1e6,
+                 "dur": (end - start) * 1e6}
+                for name, start, end in sorted(self.trace, key=lambda span: (span[1], -span[2]))
+            ],
+            "displayTimeUnit": "ms"
+        }
+
+    def save(self, file_name: str):
+        import json  # Only needed for reports, so it stays off the game's startup path
+
+        with open(file_name, 'w') as file:
+            json.dump({"summary": self.summary(), "frames": list(self.frames)}, file, indent=2)
+
+    def save_trace(self, file_name: str):
+        import json
+
+        with open(file_name, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+profiler = Profiler()
+startup_marks: list[(str, float)] = []
+
+
+def timed(name: str):
+    """
+
+    Decorator that adds the time spent in a function to a profiler section
+
+    :param name: The section
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.add_span(name, start, perf_counter())
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, amount=1):
+    if profiler.enabled:
+        profiler.counters[name] += amount
+
+
+def mark_startup(name: str) -> bool:
+    # Only the first time each point is reached counts
+    if any(mark == name for mark, _ in startup_marks):
+        return False
+
+    startup_marks.append((name, perf_counter()))
+    return True
+
+
+def startup_report(start: float) -> str:
+    """
+
+    :param start: When startup began, from time.perf_counter
+    :return: The time of each startup mark since the start and since the previous mark
+    """
+
+    lines = []
+    previous = start
+    for name, time in startup_marks:
+        lines.append(f"{name:<12} {(time - start) * 1000:8.1f} ms  (+{(time - previous) * 1000:.1f} ms)")
+        previous = time
+
+    return "\n".join(lines)
@@ -0,0 +1,170 @@
+"""
+Binary protocol between the game server and its clients.
+
+Every frame starts with a one byte type. Moves, resignations and heartbeats have a fixed size, so a move is three
+bytes: the type and the move packed into two bytes as (source * 91 + destination) * 5 + promotion. The server answers
+every PING with a PONG, so a client can tell a quiet connection from a lost one. Every other frame has a two byte
+length after the type, then that many bytes of payload. A client opens with HELLO, which carries the protocol magic and
+version, and the server closes the connection with an ERROR if it does not speak that version.
+
+All numbers are big-endian and names and messages are UTF-8.
+"""
+
+import asyncio
+import struct
+
+MAGIC = b"HXC"
+VERSION = 2
+
+# Frame types. Below 0x10 the payload has a fixed size, from 0x10 it is length-prefixed
+MOVE = 0x01
+RESIGN = 0x02
+PING = 0x03
+PONG = 0x04
+HELLO = 0x10
+COLOR = 0x11
+CLOCK = 0x12
+RESULT = 0x13
+RECORD = 0x14
+ERROR = 0x15
+
+fixed_sizes = {
+    MOVE: 2,
+    RESIGN: 0,
+    PING: 0,
+    PONG: 0
+}
+
+# Why a game ended, sent with RESULT
+CHECKMATE, STALEMATE, RESIGNATION, DISCONNECT, TIME, ILLEGAL_MOVE, MOVE_LIMIT = range(7)
+reasons = ["checkmate", "stalemate", "resignation", "disconnect", "time", "illegal move", "move limit"]
+
+move_struct = struct.Struct(">BH")
+header_struct = struct.Struct(">BH")
+hello_struct = struct.Struct(">3sB")
+clock_struct = struct.Struct(">II")
+result_struct = struct.Struct(">BB")
+record_struct = struct.Struct(">III")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_move(move: (int, int, int)) -> int:
+    source, destination, promotion = move
+    return (source * 91 + destination) * 5 + promotion
+
+
+def decode_move(code: int) -> (int, int, int):
+    cells, promotion = divmod(code, 5)
+    source, destination = divmod(cells, 91)
+    if source >= 91:
+        raise ProtocolError(f"Invalid move {code}")
+
+    return source, destination, promotion
+
+
+def frame(frame_type: int, payload=b"") -> bytes:
+    return header_struct.pack(frame_type, len(payload)) + payload
+
+
+def move_frame(move: (int, int, int)) -> bytes:
+    return move_struct.pack(MOVE, encode_move(move))
+
+
+def resign_frame() -> bytes:
+    return bytes((RESIGN,))
+
+
+def ping_frame() -> bytes:
+    return bytes((PING,))
+
+
+def pong_frame() -> bytes:
+    return bytes((PONG,))
+
+
+def hello_frame(name: str = "") -> bytes:
+    return frame(HELLO, hello_struct.pack(MAGIC, VERSION) + name.encode())
+
+
+def color_frame(color: int, opponent: str) -> bytes:
+    return frame(COLOR, bytes((color,)) + opponent.encode())
+
+
+def clock_frame(white_ms: int, black_ms: int) -> bytes:
+    return frame(CLOCK, clock_struct.pack(max(white_ms, 0), max(black_ms, 0)))
+
+
+def result_frame(result: float, reason: int) -> bytes:
+    # 0 is a black win, 1 a draw and 2 a white win
+    return frame(RESULT, result_struct.pack(int(result * 2), reason))
+
+
+def record_frame(wins: int, losses: int, draws: int) -> bytes:
+    return frame(RECORD, record_struct.pack(wins, losses, draws))
+
+
+def error_frame(message: str) -> bytes:
+    return frame(ERROR, message.encode())
+
+
+def parse_hello(payload: bytes) -> (int, str):
+    """
+
+    :param payload: The payload of a HELLO frame
+    :return: The client's protocol version and name
+    """
+
+    if len(payload) < hello_struct.size:
+        raise ProtocolError("Short HELLO")
+
+    magic, version = hello_struct.unpack_from(payload)
+    if magic != MAGIC:
+        raise ProtocolError("Not a hexagonal chess client")
+
+    return version, payload[hello_struct.size:].decode()
+
+
+def parse_color(payload: bytes) -> (int, str):
+    return payload[0], payload[1:].decode()
+
+
+def parse_clock(payload: bytes) -> (int, int):
+    # White's and black's remaining time in milliseconds
+    return clock_struct.unpack(payload)
+
+
+def parse_record(payload: bytes) -> (int, int, int):
+    return record_struct.unpack(payload)
+
+
+def parse_result(payload: bytes) -> (float, int):
+    result, reason = result_struct.unpack(payload)
+    return result / 2, reason
+
+
+async def read_frame(reader: asyncio.StreamReader) -> (int, bytes):
+    """
+
+    Reads the next frame
+
+    :param reader: The stream to read from
+    :return: The frame type and payload. Moves are returned decoded instead of as a payload.
+    """
+
+    frame_type = (await reader.readexactly(1))[0]
+
+    size = fixed_sizes.get(frame_type)
+    if size is None:
+        if frame_type < HELLO:
+            raise ProtocolError(f"Unknown frame type {frame_type}")
+
+        size = int.from_bytes(await reader.readexactly(2), "big")
+
+    payload = await reader.readexactly(size) if size else b""
+    if frame_type == MOVE:
+        return MOVE, decode_move(int.from_bytes(payload, "big"))
+
+    return frame_type, payload
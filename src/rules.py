@@ -0,0 +1,475 @@
+import random
+from axial import position_to_axial, position_to_file_and_rank
+
+positions = {
+    "0queen": "e10",
+    "0king": "g10",
+    "0bishop": ["f11", "f10", "f9"],
+    "0knight": ["d9", "h9"],
+    "0rook": ["c8", "i8"],
+    "0pawn": ["b7", "c7", "d7", "e7", "f7", "g7", "h7", "i7", "j7"],
+    "1queen": "e1",
+    "1king": "g1",
+    "1bishop": ["f1", "f2", "f3"],
+    "1knight": ["d1", "h1"],
+    "1rook": ["c1", "i1"],
+    "1pawn": ["b1", "c2", "d3", "e4", "f5", "g4", "h3", "i2", "j1"]
+}
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+
+PIECE_NAMES = {
+    PAWN: "pawn",
+    KNIGHT: "knight",
+    BISHOP: "bishop",
+    ROOK: "rook",
+    QUEEN: "queen",
+    KING: "king"
+}
+PIECE_KINDS = {name: kind for kind, name in PIECE_NAMES.items()}
+
+# ICCF promotion digits, as written by Board.get_iccf_notation
+PROMOTIONS = {1: QUEEN, 2: ROOK, 3: BISHOP, 4: KNIGHT}
+
+ORTHOGONAL_VECTORS = [(-1, 0), (0, -1), (1, -1), (1, 0), (0, 1), (-1, 1)]
+DIAGONAL_VECTORS = [(-2, 1), (-1, -1), (1, -2), (2, -1), (1, 1), (-1, 2)]
+KNIGHT_VECTORS = [(-3, 1), (-2, -1), (-1, -2), (1, -3), (2, -3), (3, -2),
+                  (3, -1), (2, 1), (1, 2), (-1, 3), (-2, 3), (-3, 2)]
+PAWN_CAPTURE_VECTORS = [(-1, 0), (1, -1)]  # For white. Multiply by -1 to get black
+PAWN_FORWARD_VECTOR = (0, -1)
+
+FILE_LENGTHS = [6 + i if i < 6 else 16 - i for i in range(11)]
+
+# Cells are indexed 0-90 file by file, a1 first and k6 last
+CELLS = [chr(i + 97) + str(rank) for i in range(11) for rank in range(1, FILE_LENGTHS[i] + 1)]
+CELL_INDEX = {cell: i for i, cell in enumerate(CELLS)}
+AXIALS = [(axial.q, axial.r) for axial in map(position_to_axial, CELLS)]
+AXIAL_INDEX = {axial: i for i, axial in enumerate(AXIALS)}
+
+# Reflection across the middle rank, used to read tables from black's point of view
+FLIP = [AXIAL_INDEX[(q, -q - r)] for q, r in AXIALS]
+
+# Reflection across the f-file. The movement rules are the same on both sides, so a position and its mirror image
+# have the same moves (mirrored) and the same value
+MIRROR = [AXIAL_INDEX[(-q, q + r)] for q, r in AXIALS]
+
+
+def _target(cell: int, vector: (int, int), distance=1) -> int:
+    q, r = AXIALS[cell]
+    return AXIAL_INDEX.get((q + vector[0] * distance, r + vector[1] * distance), -1)
+
+
+def _ray(cell: int, vector: (int, int)) -> tuple:
+    ray = []
+    distance = 1
+    while (target := _target(cell, vector, distance)) != -1:
+        ray.append(target)
+        distance += 1
+    return tuple(ray)
+
+
+def _steps(cell: int, vectors: list) -> tuple:
+    return tuple(target for target in (_target(cell, vector) for vector in vectors) if target != -1)
+
+
+ORTHOGONAL_RAYS = [tuple(ray for ray in (_ray(i, v) for v in ORTHOGONAL_VECTORS) if ray) for i in range(91)]
+DIAGONAL_RAYS = [tuple(ray for ray in (_ray(i, v) for v in DIAGONAL_VECTORS) if ray) for i in range(91)]
+KNIGHT_TARGETS = [_steps(i, KNIGHT_VECTORS) for i in range(91)]
+KING_TARGETS = [_steps(i, ORTHOGONAL_VECTORS + DIAGONAL_VECTORS) for i in range(91)]
+
+# Indexed by color, 0 for black, 1 for white
+PAWN_PUSHES = [
+    [_target(i, (-PAWN_FORWARD_VECTOR[0], -PAWN_FORWARD_VECTOR[1])) for i in range(91)],
+    [_target(i, PAWN_FORWARD_VECTOR) for i in range(91)]
+]
+PAWN_CAPTURES = [
+    [_steps(i, [(-q, -r) for q, r in PAWN_CAPTURE_VECTORS]) for i in range(91)],
+    [_steps(i, PAWN_CAPTURE_VECTORS) for i in range(91)]
+]
+PAWN_ATTACKERS = [
+    [tuple(j for j in range(91) if i in PAWN_CAPTURES[color][j]) for i in range(91)]
+    for color in range(2)
+]
+PAWN_STARTS = [
+    frozenset(CELL_INDEX[cell] for cell in positions.get("0pawn")),
+    frozenset(CELL_INDEX[cell] for cell in positions.get("1pawn"))
+]
+
+# Zobrist keys, indexed by piece code and cell. Code 0 is an empty cell, so its keys are all 0
+_random = random.Random(91)
+ZOBRIST_PIECES = [[0] * 91] + [[_random.getrandbits(64) for _ in range(91)] for _ in range(14)]
+ZOBRIST_EN_PASSANT = [_random.getrandbits(64) for _ in range(91)]
+ZOBRIST_TURN = _random.getrandbits(64)
+
+# The same keys with the cells mirrored, so the key of the mirror image is updated alongside the key itself
+MIRRORED_ZOBRIST_PIECES = [[keys[MIRROR[cell]] for cell in range(91)] for keys in ZOBRIST_PIECES]
+MIRRORED_ZOBRIST_EN_PASSANT = [ZOBRIST_EN_PASSANT[MIRROR[cell]] for cell in range(91)]
+
+
+def piece_code(color: int, kind: int) -> int:
+    # Black pieces are 1-6 and white pieces 9-14, so code >> 3 is the color and code & 7 the kind
+    return color << 3 | kind
+
+
+def move_from_iccf(notation: str) -> (int, int, int):
+    old_position = chr(int(notation[:2]) + 96) + str(int(notation[2:4]))
+    new_position = chr(int(notation[4:6]) + 96) + str(int(notation[6:8]))
+    promotion = int(notation[8]) if len(notation) == 9 else 0
+    return CELL_INDEX[old_position], CELL_INDEX[new_position], promotion
+
+
+def move_to_iccf(move: (int, int, int)) -> str:
+    source, destination, promotion = move
+    old_file_index, old_rank = position_to_file_and_rank(CELLS[source])
+    file_index, rank = position_to_file_and_rank(CELLS[destination])
+
+    notation = f"{old_file_index + 1:0>{2}}{old_rank:0>{2}}{file_index + 1:0>{2}}{rank:0>{2}}"
+    if promotion:
+        notation += str(promotion)
+
+    return notation
+
+
+def mirror_cell(cell: int) -> int:
+    return MIRROR[cell] if cell != -1 else -1
+
+
+def mirror_move(move: (int, int, int)) -> (int, int, int):
+    return MIRROR[move[0]], MIRROR[move[1]], move[2]
+
+
+class LegalMoveCache:
+    """
+
+    Bounded cache of legal moves. Mirror images share one entry, stored for the canonical orientation.
+
+    """
+
+    def __init__(self, size=65536):
+        self.size = size
+        self.moves: dict[int, list] = {}
+
+    def get(self, position) -> list:
+        key = position.canonical_key()
+        mirrored = position.is_mirrored()
+
+        moves = self.moves.get(key)
+        if moves is None:
+            moves = position.legal_moves()
+            if mirrored:
+                moves = [mirror_move(move) for move in moves]
+
+            if len(self.moves) >= self.size:
+                self.moves = {}
+            self.moves[key] = moves
+
+        if mirrored:
+            return [mirror_move(move) for move in moves]
+
+        return moves
+
+
+class Position:
+    """
+
+    Headless game state with the same movement rules as Board, without sprites or tiles. Moves are
+    (source, destination, promotion) tuples of cell indices, with promotion being the ICCF digit or 0.
+
+    """
+
+    def __init__(self, cells: bytearray = None, turn=1, en_passant=-1, en_passant_victim=-1, ply=0, key=None,
+                 mirror_key=None):
+        if cells is None:
+            cells = bytearray(91)
+
+        self.cells = cells
+        self.turn = turn
+        self.en_passant = en_passant
+        self.en_passant_victim = en_passant_victim
+        self.ply = ply
+        self.key = key if key is not None else self.compute_key()
+        self.mirror_key = mirror_key if mirror_key is not None else self.compute_key(True)
+
+    def copy(self):
+        return Position(self.cells[:], self.turn, self.en_passant, self.en_passant_victim, self.ply, self.key,
+                        self.mirror_key)
+
+    def compute_key(self, mirrored=False) -> int:
+        pieces = MIRRORED_ZOBRIST_PIECES if mirrored else ZOBRIST_PIECES
+        key = ZOBRIST_TURN if self.turn else 0
+        for cell, code in enumerate(self.cells):
+            key ^= pieces[code][cell]
+
+        if self.en_passant != -1:
+            key ^= (MIRRORED_ZOBRIST_EN_PASSANT if mirrored else ZOBRIST_EN_PASSANT)[self.en_passant]
+
+        return key
+
+    def set_piece(self, cell: int, code: int) -> None:
+        old_code = self.cells[cell]
+        self.key ^= ZOBRIST_PIECES[old_code][cell] ^ ZOBRIST_PIECES[code][cell]
+        self.mirror_key ^= MIRRORED_ZOBRIST_PIECES[old_code][cell] ^ MIRRORED_ZOBRIST_PIECES[code][cell]
+        self.cells[cell] = code
+
+    def is_mirrored(self) -> bool:
+        # Whether the canonical form of this position is its mirror image
+        return self.mirror_key < self.key
+
+    def canonical_key(self) -> int:
+        """
+
+        Gets a key shared by this position and its mirror image across the f-file, for tables that should only
+        store one of the two
+
+        :return: The smaller of the position's key and its mirror image's key
+        """
+
+        return self.mirror_key if self.mirror_key < self.key else self.key
+
+    def mirrored(self):
+        position = Position(bytearray(91), self.turn, mirror_cell(self.en_passant), mirror_cell(self.en_passant_victim),
+                            self.ply, self.mirror_key, self.key)
+        for cell, code in enumerate(self.cells):
+            position.cells[MIRROR[cell]] = code
+
+        return position
+
+    def canonical(self):
+        return self.mirrored() if self.is_mirrored() else self
+
+    def king_cell(self, color: int) -> int:
+        return self.cells.find(piece_code(color, KING))
+
+    def is_attacked(self, cell: int, color: int) -> bool:
+        # Whether the pieces of the given color attack the cell
+        cells = self.cells
+
+        knight = piece_code(color, KNIGHT)
+        for target in KNIGHT_TARGETS[cell]:
+            if cells[target] == knight:
+                return True
+
+        king = piece_code(color, KING)
+        for target in KING_TARGETS[cell]:
+            if cells[target] == king:
+                return True
+
+        pawn = piece_code(color, PAWN)
+        for target in PAWN_ATTACKERS[color][cell]:
+            if cells[target] == pawn:
+                return True
+
+        queen = piece_code(color, QUEEN)
+        rook = piece_code(color, ROOK)
+        for ray in ORTHOGONAL_RAYS[cell]:
+            for target in ray:
+                code = cells[target]
+                if code:
+                    if code == rook or code == queen:
+                        return True
+                    break
+
+        bishop = piece_code(color, BISHOP)
+        for ray in DIAGONAL_RAYS[cell]:
+            for target in ray:
+                code = cells[target]
+                if code:
+                    if code == bishop or code == queen:
+                        return True
+                    break
+
+        return False
+
+    def in_check(self, color: int = None) -> bool:
+        if color is None:
+            color = self.turn
+
+        king = self.king_cell(color)
+        if king == -1:
+            return False
+
+        return self.is_attacked(king, 1 - color)
+
+    def pseudo_legal_moves(self) -> list:
+        moves = []
+        cells = self.cells
+        color = self.turn
+
+        for source, code in enumerate(cells):
+            if not code or code >> 3 != color:
+                continue
+
+            kind = code & 7
+            if kind == PAWN:
+                self._pawn_moves(source, moves)
+                continue
+
+            if kind == KNIGHT or kind == KING:
+                for target in (KNIGHT_TARGETS if kind == KNIGHT else KING_TARGETS)[source]:
+                    other = cells[target]
+                    if not other or other >> 3 != color:
+                        moves.append((source, target, 0))
+                continue
+
+            rays = ORTHOGONAL_RAYS[source] if kind == ROOK else DIAGONAL_RAYS[source]
+            if kind == QUEEN:
+                rays = ORTHOGONAL_RAYS[source] + DIAGONAL_RAYS[source]
+
+            for ray in rays:
+                for target in ray:
+                    other = cells[target]
+                    if other:
+                        if other >> 3 != color:
+                            moves.append((source, target, 0))
+                        break
+                    moves.append((source, target, 0))
+
+        return moves
+
+    def _pawn_moves(self, source: int, moves: list) -> None:
+        cells = self.cells
+        color = self.turn
+        pushes = PAWN_PUSHES[color]
+
+        targets = []
+        for target in PAWN_CAPTURES[color][source]:
+            other = cells[target]
+            if other and other >> 3 != color:
+                targets.append(target)
+            elif not other and target == self.en_passant:
+                targets.append(target)
+
+        target = pushes[source]
+        if target != -1 and not cells[target]:
+            targets.append(target)
+
+            if source in PAWN_STARTS[color]:
+                target = pushes[target]
+                if target != -1 and not cells[target]:
+                    targets.append(target)
+
+        for target in targets:
+            if pushes[target] == -1:
+                moves.extend((source, target, promotion) for promotion in PROMOTIONS)
+            else:
+                moves.append((source, target, 0))
+
+    def legal_moves(self) -> list:
+        # Each move is made and unmade on the cells in place, which is much cheaper than applying it to a copy
+        legal_moves = []
+        cells = self.cells
+        enemy = 1 - self.turn
+        enemy_pawn = piece_code(enemy, PAWN)
+        king = self.king_cell(self.turn)
+
+        for move in self.pseudo_legal_moves():
+            source, destination, _ = move
+            code = cells[source]
+            captured = cells[destination]
+
+            victim = -1
+            if code & 7 == PAWN and not captured and AXIALS[source][0] != AXIALS[destination][0]:
+                victim = PAWN_PUSHES[enemy][destination]
+                if victim != -1 and cells[victim] == enemy_pawn:
+                    cells[victim] = 0
+                else:
+                    victim = -1
+
+            cells[source] = 0
+            cells[destination] = code
+
+            target = destination if code & 7 == KING else king
+            if target == -1 or not self.is_attacked(target, enemy):
+                legal_moves.append(move)
+
+            cells[source] = code
+            cells[destination] = captured
+            if victim != -1:
+                cells[victim] = enemy_pawn
+
+        return legal_moves
+
+    def apply(self, move: (int, int, int)) -> int:
+        """
+
+        Applies a move without checking that it is legal, the same way Board.load_state replays moves
+
+        :param move: The move to apply
+        :return: The code of the captured piece, or 0 if nothing was captured
+        """
+
+        source, destination, promotion = move
+        cells = self.cells
+        code = cells[source]
+        color = code >> 3
+        captured = cells[destination]
+
+        if self.en_passant != -1:
+            self.key ^= ZOBRIST_EN_PASSANT[self.en_passant]
+            self.mirror_key ^= MIRRORED_ZOBRIST_EN_PASSANT[self.en_passant]
+            self.en_passant = -1
+            self.en_passant_victim = -1
+
+        if code & 7 == PAWN:
+            if AXIALS[source][0] != AXIALS[destination][0]:
+                if not cells[destination]:
+                    victim = PAWN_PUSHES[1 - color][destination]
+                    if victim != -1 and cells[victim] == piece_code(1 - color, PAWN):
+                        captured = cells[victim]
+                        self.set_piece(victim, 0)
+            elif source in PAWN_STARTS[color]:
+                self.en_passant = PAWN_PUSHES[1 - color][destination]
+                self.en_passant_victim = destination
+                self.key ^= ZOBRIST_EN_PASSANT[self.en_passant]
+                self.mirror_key ^= MIRRORED_ZOBRIST_EN_PASSANT[self.en_passant]
+
+            if promotion:
+                code = piece_code(color, PROMOTIONS[promotion])
+
+        self.set_piece(source, 0)
+        self.set_piece(destination, code)
+
+        self.key ^= ZOBRIST_TURN
+        self.mirror_key ^= ZOBRIST_TURN
+        self.turn = 1 - self.turn
+        self.ply += 1
+
+        return captured
+
+    def result(self) -> float | None:
+        """
+
+        Gets the result of the game if it is over
+
+        :return: 1 if white won, 0 if black won, 0.5 for stalemate and None if the game is still going
+        """
+
+        if self.legal_moves():
+            return None
+
+        if self.in_check():
+            return float(1 - self.turn)
+
+        return 0.5
+
+
+def starting_position() -> Position:
+    position = Position()
+
+    for key, cells in positions.items():
+        if isinstance(cells, str):
+            cells = [cells]
+
+        for cell in cells:
+            position.set_piece(CELL_INDEX[cell], piece_code(int(key[0]), PIECE_KINDS[key[1:]]))
+
+    return position
+
+
+def position_from_state(state: list[str]) -> Position:
+    position = starting_position()
+
+    for notation in state:
+        position.apply(move_from_iccf(notation))
+
+    return position
@@ -0,0 +1,69 @@
+import pygame
+from pygame.locals import *
+from profiler import profiler
+
+# Events that mean the window contents may have been lost and have to be drawn again
+expose_events = {VIDEOEXPOSE, WINDOWEXPOSED, WINDOWRESTORED, WINDOWSHOWN}
+
+
+class FrameScheduler:
+    """
+
+    Paces a screen loop. While the screen is invalidated or animating (like a piece being dragged), frames are capped
+    at fps. Otherwise the loop sleeps in pygame.event.wait until an event arrives or idle_timeout milliseconds pass, so
+    an idle window uses no CPU.
+
+    """
+
+    def __init__(self, fps=60, idle_timeout=250):
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.idle_timeout = idle_timeout
+        self.dirty = True
+        self.animating = False
+        self.exposed = False
+
+    def invalidate(self):
+        self.dirty = True
+
+    def get_events(self) -> list[pygame.event.Event]:
+        """
+
+        Waits for the next frame and collects its events. Only sleeps through pygame.event.wait when the previous frame
+        left nothing to redraw.
+
+        :return: The events of this frame
+        """
+
+        profiler.end_frame()  # Waiting for the next frame is not part of the last one
+
+        if self.dirty or self.animating:
+            self.clock.tick(self.fps)
+            events = pygame.event.get()
+        else:
+            event = pygame.event.wait(self.idle_timeout)
+            events = [] if event.type == NOEVENT else [event] + pygame.event.get()
+            self.clock.tick()
+
+        self.exposed = any(event.type in expose_events for event in events)
+        if self.exposed:
+            self.invalidate()
+
+        profiler.begin_frame()
+        return events
+
+    def should_render(self) -> bool:
+        # Returns whether the frame was invalidated, and marks it as drawn
+        if not self.dirty:
+            return False
+
+        self.dirty = False
+        return True
+
+
+# Screens get their scheduler from here, so input_replay can record or replay every screen's events
+scheduler_factory = FrameScheduler
+
+
+def create_scheduler(fps=60, idle_timeout=250) -> FrameScheduler:
+    return scheduler_factory(fps, idle_timeout)
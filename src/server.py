@@ -1,37 +1,321 @@
-import socket
-import threading
+"""
+Game server hosting many games at once on one asyncio event loop.
 
-def handle_client(client_socket: socket.SocketType, client_number: int) -> None:
-    print(f"Client {client_number} connected")
+Clients speak the binary protocol in protocol.py. A client says HELLO with an optional name, and is paired with the
+next client to connect. The server then tells each of them its color and the name of its opponent. Players send their
+moves, which the server relays to the opponent along with both clocks when the game has a time control. When a game
+ends, the server sends both players the result and their record, logs the game and closes the connections.
 
-    client_socket.close()
-    print(f"Client {client_number} disconnected")
+Clients are not trusted. Every move is checked against the legal moves of the server's own position, and a player
+who keeps sending illegal moves forfeits. Each game's state is a rules.Position and arrays of two byte moves, with the
+length of a game capped so that a game never outgrows its share of the memory budget.
+"""
 
+import argparse
+import asyncio
+import sys
+from array import array
+from bisect import bisect_left
+from rules import starting_position, move_to_iccf
+from game_log import format_game
+from protocol import (HELLO, MOVE, RESIGN, PING, VERSION, CHECKMATE, STALEMATE, RESIGNATION, DISCONNECT, TIME,
+                      ILLEGAL_MOVE, MOVE_LIMIT, ProtocolError, read_frame, parse_hello, encode_move, move_frame,
+                      color_frame, decode_move, clock_frame, result_frame, record_frame, error_frame, pong_frame)
 
-def main() -> None:
-    host = '127.0.0.1'
-    port = 12345
-    clients = []
 
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((host, port))
-    server_socket.listen(2)
+def encoded_legal_moves(position) -> array:
+    # Sorted, so a move is checked with a binary search, and two bytes a move
+    return array('H', sorted(encode_move(move) for move in position.legal_moves()))
+
+
+# Every game starts with the same legal moves, so they share one array
+starting_legal_moves = encoded_legal_moves(starting_position())
+
+
+class Connection:
+    __slots__ = ("reader", "writer", "address", "name", "game", "color")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.address = writer.get_extra_info("peername")
+        self.name = None
+        self.game: Game | None = None
+        self.color = None
+
+    def send(self, data: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def close(self):
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+class Game:
+    """
+
+    A game between two connections, indexed by color. The position and the legal moves in it are kept to validate
+    moves and know when the game is over, and the clocks hold each side's remaining time in seconds. Moves are stored
+    encoded as in the protocol.
+
+    """
+
+    __slots__ = ("game_id", "players", "position", "moves", "legal_moves", "illegal_moves", "result", "clocks",
+                 "turn_started", "flag_timer")
+
+    def __init__(self, game_id: int, black: Connection, white: Connection, time_control: float = None):
+        self.game_id = game_id
+        self.players = [black, white]
+        self.position = starting_position()
+        self.moves = array('H')
+        self.legal_moves = starting_legal_moves
+        self.illegal_moves = [0, 0]  # By color
+        self.result: float | None = None
+        self.clocks = [time_control, time_control] if time_control is not None else None
+        self.turn_started = 0.
+        self.flag_timer: asyncio.TimerHandle | None = None
+
+    def opponent(self, connection: Connection) -> Connection:
+        return self.players[1 - connection.color]
+
+    def clock_frame(self) -> bytes:
+        return clock_frame(int(self.clocks[1] * 1000), int(self.clocks[0] * 1000))
+
+    def is_legal(self, code: int) -> bool:
+        index = bisect_left(self.legal_moves, code)
+        return index < len(self.legal_moves) and self.legal_moves[index] == code
+
+    def memory_size(self) -> int:
+        position = self.position
+        return (sys.getsizeof(self) + sys.getsizeof(position) + sys.getsizeof(position.__dict__) +
+                sys.getsizeof(position.cells) + sys.getsizeof(self.moves) + sys.getsizeof(self.legal_moves) +
+                sys.getsizeof(self.illegal_moves))
+
+
+class GameServer:
+    """
+
+    Pairs clients into games and relays their moves. Every connection is served by its own coroutine, and games live
+    in a registry until they end. With a time control, each game has one timer, for the side to move running out.
+
+    """
+
+    def __init__(self, log_file: str = None, time_control: float = None, increment=0., max_plies=1000,
+                 max_illegal_moves=3, memory_budget: int = None):
+        self.games: dict[int, Game] = {}
+        self.waiting: Connection | None = None
+        self.next_game_id = 0
+        self.connections = 0
+        self.finished_games = 0
+        self.records: dict[str, list[int]] = {}  # Wins, losses and draws by name
+        self.time_control = time_control
+        self.increment = increment
+        self.max_plies = max_plies
+        self.max_illegal_moves = max_illegal_moves
+
+        # Games are refused once the budget could not hold another one at its largest
+        self.max_games = memory_budget // self.game_size_bound() if memory_budget is not None else None
+        self.log = open(log_file, 'a') if log_file is not None else None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = Connection(reader, writer)
+        self.connections += 1
+
+        try:
+            frame_type, payload = await read_frame(reader)
+            if frame_type != HELLO:
+                raise ProtocolError("Expected HELLO")
+
+            version, name = parse_hello(payload)
+            if version != VERSION:
+                raise ProtocolError(f"Unsupported protocol version {version}, the server speaks {VERSION}")
+
+            # Players without a name are known by their address
+            connection.name = name or connection.address[0]
+            self.join(connection)
+
+            while True:
+                frame_type, payload = await read_frame(reader)
+                self.handle_message(connection, frame_type, payload)
+                await writer.drain()
+        except ProtocolError as error:
+            connection.send(error_frame(str(error)))
+        except (asyncio.IncompleteReadError, ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            self.connections -= 1
+            self.leave(connection)
+            connection.close()
 
-    print("Server is listening for clients...")
+    def game_size_bound(self) -> int:
+        """
 
-    for client_number in range(1, 3):
-        client_socket, client_address = server_socket.accept()
-        print(f"Client {client_number} connected from {client_address}")
-        clients.append((client_socket, client_number))
+        :return: The most bytes the state of a game can take, with the longest allowed move list and legal move array
+        """
 
-        client_thread = threading.Thread(target=handle_client, args=(client_socket, client_number))
-        client_thread.start()
+        game = Game(0, None, None, self.time_control)
+        game.moves = array('H', bytes(2 * self.max_plies))
+        game.legal_moves = array('H', bytes(2 * 300))  # No position comes near 300 legal moves
+        return game.memory_size()
 
-    for client_thread in threading.enumerate():
-        if client_thread != threading.current_thread():
-            client_thread.join()
+    def join(self, connection: Connection):
+        if self.max_games is not None and len(self.games) >= self.max_games:
+            connection.send(error_frame("The server is full"))
+            connection.close()
+            return
+
+        if self.waiting is None:
+            self.waiting = connection
+            return
+
+        # The player who waited plays white
+        white, self.waiting = self.waiting, None
+        game = Game(self.next_game_id, connection, white, self.time_control)
+        self.next_game_id += 1
+        self.games[game.game_id] = game
+
+        for color, player in enumerate(game.players):
+            player.game = game
+            player.color = color
+            player.send(color_frame(color, game.opponent(player).name))
+
+        if game.clocks is not None:
+            for player in game.players:
+                player.send(game.clock_frame())
+            self.start_clock(game)
+
+    def leave(self, connection: Connection):
+        if self.waiting is connection:
+            self.waiting = None
+
+        game = connection.game
+        if game is not None and game.result is None:
+            # Leaving a game forfeits it
+            self.finish(game, float(1 - connection.color), DISCONNECT)
+
+    def start_clock(self, game: Game):
+        loop = asyncio.get_running_loop()
+        game.turn_started = loop.time()
+        game.flag_timer = loop.call_later(game.clocks[game.position.turn], self.flag, game)
+
+    def flag(self, game: Game):
+        if game.result is None:
+            game.clocks[game.position.turn] = 0.
+            self.finish(game, float(1 - game.position.turn), TIME)
+
+    def handle_message(self, connection: Connection, frame_type: int, payload):
+        if frame_type == PING:  # Answered while waiting for an opponent too
+            connection.send(pong_frame())
+            return
+
+        game = connection.game
+        if game is None or game.result is not None:
+            connection.send(error_frame("Not in a game"))
+            return
+
+        if frame_type == MOVE:
+            if game.position.turn != connection.color:
+                connection.send(error_frame("Not your turn"))
+                return
+
+            move = payload
+            code = encode_move(move)
+            if not game.is_legal(code):
+                game.illegal_moves[connection.color] += 1
+                if game.illegal_moves[connection.color] >= self.max_illegal_moves:
+                    self.finish(game, float(1 - connection.color), ILLEGAL_MOVE)
+                else:
+                    connection.send(error_frame("Illegal move"))
+                return
+
+            game.position.apply(move)
+            game.moves.append(code)
+            game.opponent(connection).send(move_frame(move))
+
+            if game.clocks is not None:
+                game.flag_timer.cancel()
+                game.clocks[connection.color] += self.increment - (asyncio.get_running_loop().time() -
+                                                                   game.turn_started)
+                for player in game.players:
+                    player.send(game.clock_frame())
+
+            # The legal moves are needed to validate the next move anyway, and finding none ends the game
+            game.legal_moves = encoded_legal_moves(game.position)
+            if not game.legal_moves:
+                if game.position.in_check():
+                    self.finish(game, float(connection.color), CHECKMATE)
+                else:
+                    self.finish(game, 0.5, STALEMATE)
+            elif len(game.moves) >= self.max_plies:
+                self.finish(game, 0.5, MOVE_LIMIT)
+            elif game.clocks is not None:
+                self.start_clock(game)
+        elif frame_type == RESIGN:
+            self.finish(game, float(1 - connection.color), RESIGNATION)
+        else:
+            connection.send(error_frame(f"Unexpected frame type {frame_type}"))
+
+    def finish(self, game: Game, result: float, reason: int):
+        game.result = result
+        if game.flag_timer is not None:
+            game.flag_timer.cancel()
+
+        for player in game.players:
+            score = result if player.color == 1 else 1 - result
+            record = self.records.setdefault(player.name, [0, 0, 0])
+            record[0 if score == 1 else 1 if score == 0 else 2] += 1
+
+            player.send(result_frame(result, reason))
+            player.send(record_frame(*record))
+            player.close()
+
+        if self.log is not None:
+            self.log.write(format_game([move_to_iccf(decode_move(code)) for code in game.moves], result) + "\n")
+            self.log.flush()
+
+        del self.games[game.game_id]
+        self.finished_games += 1
+
+    async def report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            game_bytes = sum(game.memory_size() for game in self.games.values())
+            print(f"{self.connections} connections, {len(self.games)} games, {self.finished_games} finished, "
+                  f"{game_bytes / max(len(self.games), 1):.0f} bytes of state per game")
+
+
+async def serve(host: str, port: int, log_file: str = None, report_interval: float = 0., time_control: float = None,
+                increment=0., max_plies=1000, memory_budget: int = None) -> None:
+    game_server = GameServer(log_file, time_control, increment, max_plies, memory_budget=memory_budget)
+    server = await asyncio.start_server(game_server.handle_connection, host, port, backlog=4096)
+    print(f"Server is listening on {host}:{port}")
+
+    # Kept referenced, since the event loop only holds tasks weakly
+    report = asyncio.create_task(game_server.report(report_interval)) if report_interval > 0 else None
+
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hosts games between clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--log", default=None, help="File to append finished games to")
+    parser.add_argument("--report-interval", type=float, default=0., help="Seconds between status lines, 0 for none")
+    parser.add_argument("--time-control", type=float, default=None, help="Seconds on each clock, none for no clocks")
+    parser.add_argument("--increment", type=float, default=0., help="Seconds added to a clock after each move")
+    parser.add_argument("--max-plies", type=int, default=1000, help="Plies after which a game is drawn")
+    parser.add_argument("--memory-budget", type=float, default=None, help="Megabytes of game state to allow")
+    args = parser.parse_args()
 
-    server_socket.close()
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    try:
+        asyncio.run(serve(args.host, args.port, args.log, args.report_interval, args.time_control, args.increment,
+                          args.max_plies, memory_budget))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
@@ -0,0 +1,56 @@
+from rules import Position, starting_position
+
+
+class GameTimeline:
+    """
+
+    The moves of a game from the starting position, with a snapshot of the position every interval plies. Moves are
+    trusted to be legal and applied without checking, and seeking to a ply copies the nearest snapshot before it and
+    applies at most interval - 1 moves, however long the game is.
+
+    """
+
+    def __init__(self, moves: list[(int, int, int)] = None, interval=16):
+        self.interval = interval
+        self.moves: list[(int, int, int)] = []
+        self.snapshots: list[Position] = [starting_position()]
+        self.position = starting_position()
+
+        for move in moves or []:
+            self.append(move)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def append(self, move: (int, int, int)):
+        self.position.apply(move)
+        self.moves.append(move)
+
+        if len(self.moves) % self.interval == 0:
+            self.snapshots.append(self.position.copy())
+
+    def truncate(self, ply: int):
+        # Drops the moves after a ply
+        self.position = self.position_at(ply)
+        del self.moves[self.position.ply:]
+        del self.snapshots[self.position.ply // self.interval + 1:]
+
+    def last_move(self, ply: int) -> (int, int, int):
+        return self.moves[ply - 1] if ply > 0 else None
+
+    def position_at(self, ply: int) -> Position:
+        """
+
+        :param ply: Number of moves played, clamped to the length of the game
+        :return: A copy of the position after that many moves
+        """
+
+        ply = max(0, min(ply, len(self.moves)))
+        if ply == len(self.moves):
+            return self.position.copy()
+
+        position = self.snapshots[ply // self.interval].copy()
+        for move in self.moves[position.ply:ply]:
+            position.apply(move)
+
+        return position
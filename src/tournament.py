@@ -0,0 +1,309 @@
+import argparse
+import os
+import random
+import time
+from math import log, log10, sqrt
+from multiprocessing import Pool
+from engine import Search
+from evaluation import Weights, load_weights
+from game_log import iter_games, format_game
+from rules import starting_position, move_from_iccf, move_to_iccf
+
+default_config = {
+    "depth": None,
+    "nodes": None,
+    "movetime": None,
+    "weights": None,
+    "hash": 1 << 18
+}
+
+
+def parse_config(text: str) -> dict:
+    """
+
+    Parses an engine configuration such as "nodes=2000,weights=tuned.json"
+
+    :param text: Comma separated key=value pairs
+    :return: The configuration
+    """
+
+    config = dict(default_config)
+
+    for item in filter(None, text.split(",")):
+        name, value = item.split("=", 1)
+        if name not in config:
+            raise Exception(f"Unknown engine option {name}")
+
+        if name == "weights":
+            # Relative to where the tournament is run, not the project root Weights resolves from
+            if not os.path.isfile(value):
+                raise Exception(f"Weights file {value} does not exist")
+            config[name] = os.path.abspath(value)
+        else:
+            config[name] = int(value)
+
+    if config["depth"] is None and config["nodes"] is None and config["movetime"] is None:
+        config["depth"] = 2
+
+    return config
+
+
+def load_openings(paths: list[str], plies: int, count: int) -> list[list[str]]:
+    openings = []
+    seen = set()
+
+    for moves, _ in iter_games(paths):
+        opening = tuple(moves[:plies])
+        if len(opening) == plies and opening not in seen:
+            seen.add(opening)
+            openings.append(list(opening))
+
+        if len(openings) >= count:
+            break
+
+    return openings
+
+
+def random_opening(rng: random.Random, plies: int) -> list[str]:
+    while True:
+        position = starting_position()
+        opening = []
+
+        for _ in range(plies):
+            moves = position.legal_moves()
+            if not moves:
+                break
+
+            move = rng.choice(moves)
+            opening.append(move_to_iccf(move))
+            position.apply(move)
+
+        if len(opening) == plies and position.legal_moves():
+            return opening
+
+
+searches: dict[int, Search] = {}
+configs: list[dict] = []
+
+
+def initialize_worker(engine_configs: list[dict]) -> None:
+    configs.extend(engine_configs)
+
+    # Engines without their own weights play with weights.json, like uci.py and main.py
+    load_weights()
+
+    for i, config in enumerate(configs):
+        weights = Weights(config["weights"]) if config["weights"] is not None else None
+        searches[i] = Search(config["hash"], weights)
+
+
+def play_game(opening: list[str], white: int, max_plies: int) -> (list[str], float):
+    """
+
+    Plays one game between two configured engines
+
+    :param opening: ICCF moves to start from
+    :param white: Index of the engine playing white
+    :param max_plies: Games still going after this many plies are drawn
+    :return: The game in ICCF notation and the result for white
+    """
+
+    players = {1: white, 0: 1 - white}
+    for search in searches.values():
+        search.clear()
+
+    position = starting_position()
+    state = []
+    for notation in opening:
+        position.apply(move_from_iccf(notation))
+        state.append(notation)
+
+    repetitions = {position.key: 1}
+
+    while True:
+        result = position.result()
+        if result is not None:
+            return state, result
+
+        if position.ply >= max_plies:
+            return state, 0.5
+
+        player = players[position.turn]
+        config = configs[player]
+        move, _ = searches[player].search(position, config["depth"], config["nodes"], config["movetime"])
+
+        position.apply(move)
+        state.append(move_to_iccf(move))
+
+        repetitions[position.key] = repetitions.get(position.key, 0) + 1
+        if repetitions[position.key] >= 3:
+            return state, 0.5
+
+
+def play_pair(task: (int, list[str], int)) -> (int, list[tuple]):
+    # Plays an opening twice with colours swapped, so neither engine gets the better side of it
+    pair, opening, max_plies = task
+    games = []
+
+    for white in range(2):
+        state, result = play_game(opening, white, max_plies)
+        games.append((white, state, result))
+
+    return pair, games
+
+
+def elo_from_score(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * log10(1 / score - 1)
+
+
+def score_from_elo(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class Results:
+    """
+
+    Running results from the first engine's point of view, with the Elo estimate and the sequential probability
+    ratio test
+
+    """
+
+    def __init__(self, elo0: float, elo1: float, alpha: float, beta: float):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower_bound = log(beta / (1 - alpha))
+        self.upper_bound = log((1 - beta) / alpha)
+
+    def add(self, score: float):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def score_and_variance(self, regularize=False) -> (float, float):
+        """
+
+        :param regularize: Adds half a win and half a loss, so results that are all the same still have a variance
+        :return: The mean score per game and its variance
+        """
+
+        wins, draws, losses = self.wins, self.draws, self.losses
+        if regularize:
+            wins += 0.5
+            losses += 0.5
+
+        games = wins + draws + losses
+        score = (wins + draws / 2) / games
+        variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+        return score, variance
+
+    def elo(self) -> (float, float):
+        """
+
+        :return: The Elo difference and the half-width of its 95% confidence interval
+        """
+
+        score, variance = self.score_and_variance()
+        margin = 1.96 * sqrt(variance / self.games())
+        low = elo_from_score(score - margin)
+        high = elo_from_score(score + margin)
+        return elo_from_score(score), (high - low) / 2
+
+    def log_likelihood_ratio(self) -> float:
+        # Normal approximation of the generalised SPRT over win/draw/loss results
+        if self.games() == 0:
+            return 0.
+
+        score, variance = self.score_and_variance(regularize=True)
+        score0 = score_from_elo(self.elo0)
+        score1 = score_from_elo(self.elo1)
+        return (self.games() + 1) * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+    def sprt_decision(self) -> str | None:
+        llr = self.log_likelihood_ratio()
+        if llr >= self.upper_bound:
+            return "H1"
+        if llr <= self.lower_bound:
+            return "H0"
+        return None
+
+    def summary(self) -> str:
+        elo, margin = self.elo() if self.games() else (0., 0.)
+        return (f"Games {self.games()}: +{self.wins} ={self.draws} -{self.losses}  Elo {elo:+.1f} +/- {margin:.1f}  "
+                f"LLR {self.log_likelihood_ratio():.2f} ({self.lower_bound:.2f}, {self.upper_bound:.2f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plays two engine configurations against each other")
+    parser.add_argument("--engine", action="append", default=[],
+                        help="Engine configuration, e.g. nodes=2000,weights=tuned.json. Give it twice")
+    parser.add_argument("--games", type=int, default=1000, help="Maximum number of games, played in pairs with colours swapped")
+    parser.add_argument("--openings", nargs="*", default=None, help="Game logs to take openings from")
+    parser.add_argument("--opening-plies", type=int, default=6)
+    parser.add_argument("--max-plies", type=int, default=400)
+    parser.add_argument("--elo0", type=float, default=0.)
+    parser.add_argument("--elo1", type=float, default=5.)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--log", default="tournament.log", help="Per-game log in ICCF notation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine_texts = args.engine + [""] * (2 - len(args.engine))
+    engine_configs = [parse_config(text) for text in engine_texts[:2]]
+
+    pairs = args.games // 2
+    if pairs == 0:
+        raise Exception("At least one pair of games is needed")
+
+    rng = random.Random(args.seed)
+    if args.openings:
+        openings = load_openings(args.openings, args.opening_plies, pairs)
+        if not openings:
+            raise Exception("No openings found in the logs")
+    else:
+        openings = [random_opening(rng, args.opening_plies) for _ in range(pairs)]
+
+    tasks = [(pair, openings[pair % len(openings)], args.max_plies) for pair in range(pairs)]
+    results = Results(args.elo0, args.elo1, args.alpha, args.beta)
+    decision = None
+    start_time = time.time()
+
+    with open(args.log, 'w') as log_file, \
+            Pool(args.processes, initializer=initialize_worker, initargs=(engine_configs,)) as pool:
+        for pair, games in pool.imap_unordered(play_pair, tasks):
+            for white, state, result in games:
+                results.add(result if white == 0 else 1 - result)
+                log_file.write(format_game(state, result) + "\n")
+
+            log_file.flush()
+            print(results.summary())
+
+            decision = results.sprt_decision()
+            if decision is not None:
+                pool.terminate()
+                break
+
+    elo, margin = results.elo() if results.games() else (0., 0.)
+    print(f"Finished in {time.time() - start_time:.1f}s")
+    print(f"Elo difference: {elo:+.1f} +/- {margin:.1f} (95%)")
+    if decision == "H1":
+        print(f"SPRT: H1 accepted, the first engine is at least {args.elo1} Elo stronger")
+    elif decision == "H0":
+        print(f"SPRT: H0 accepted, the first engine is not {args.elo1} Elo stronger")
+    else:
+        print("SPRT: inconclusive")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import os
+import time
+import numpy as np
+from math import log
+from evaluation import Weights
+from game_log import iter_games
+from rules import PIECE_NAMES, FLIP, MIRROR, starting_position, move_from_iccf
+
+max_pieces = 36
+feature_count = 6 + 6 * 91  # Piece values, then one piece-square table per piece
+padding = feature_count  # Unused slots point here, and this weight is always 0
+king_value = 5  # The king's piece value is the same for both sides, so it is never tuned
+
+# Mirror images share one table entry, since the evaluation treats them as the same position
+table_cells = [min(cell, MIRROR[cell]) for cell in range(91)]
+
+
+def position_features(position) -> list[int]:
+    """
+
+    Gets the active features of a position. Each piece adds its piece value and its piece-square table entry, and
+    black pieces are read from the flipped table and counted negatively.
+
+    :param position: A rules.Position
+    :return: The signed feature indices, padded to 2 * max_pieces
+    """
+
+    features = []
+    for cell, code in enumerate(position.cells):
+        if not code:
+            continue
+
+        kind = (code & 7) - 1
+        if code >> 3:
+            features.append(kind + 1)
+            features.append(6 + kind * 91 + table_cells[cell] + 1)
+        else:
+            features.append(-kind - 1)
+            features.append(-(6 + kind * 91 + table_cells[FLIP[cell]] + 1))
+
+    features.extend([padding + 1] * (2 * max_pieces - len(features)))
+    return features
+
+
+def load_positions(paths: list[str], skip_plies=8, chunk_size=65536) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+
+    Replays the games in the logs and turns every position into a row of feature indices
+
+    :param paths: Log files or directories
+    :param skip_plies: The number of opening plies to leave out of the data set
+    :param chunk_size: Positions converted to arrays at a time, to keep the Python lists small
+    :return: The feature indices, their signs and the game result of every position
+    """
+
+    chunks = []
+    rows = []
+    labels = []
+
+    def flush():
+        features = np.array(rows, dtype=np.int16)
+        chunks.append((np.abs(features) - 1, np.sign(features).astype(np.int8), np.array(labels, dtype=np.float32)))
+        rows.clear()
+        labels.clear()
+
+    for moves, result in iter_games(paths):
+        position = starting_position()
+        game_rows = []
+
+        for notation in moves:
+            position.apply(move_from_iccf(notation))
+            if position.ply >= skip_plies and not position.in_check():
+                game_rows.append(position_features(position))
+
+        if result is None:
+            result = position.result()
+            if result is None:
+                result = 0.5
+
+        rows.extend(game_rows)
+        labels.extend([result] * len(game_rows))
+
+        if len(rows) >= chunk_size:
+            flush()
+
+    if rows or not chunks:
+        flush()
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*chunks))
+
+
+def weights_to_vector(weights: Weights) -> np.ndarray:
+    vector = np.zeros(feature_count + 1, dtype=np.float32)
+
+    for kind, name in PIECE_NAMES.items():
+        vector[kind - 1] = weights.piece_values[name]
+        vector[6 + (kind - 1) * 91:6 + kind * 91] = weights.tables[name]
+
+    vector[king_value] = 0
+    return vector
+
+
+def vector_to_weights(vector: np.ndarray, weights: Weights) -> Weights:
+    for kind, name in PIECE_NAMES.items():
+        weights.piece_values[name] = round(float(vector[kind - 1]), 2)
+        table = vector[6 + (kind - 1) * 91:6 + kind * 91]
+        weights.tables[name] = [round(float(table[table_cells[cell]]), 2) for cell in range(91)]
+
+    return weights
+
+
+def evaluate_all(vector: np.ndarray, indices: np.ndarray, signs: np.ndarray, batch_size=65536) -> np.ndarray:
+    scores = np.empty(len(indices), dtype=np.float32)
+
+    for start in range(0, len(indices), batch_size):
+        end = start + batch_size
+        scores[start:end] = (vector[indices[start:end]] * signs[start:end]).sum(axis=1)
+
+    return scores
+
+
+def win_probability(scores: np.ndarray, scaling: float) -> np.ndarray:
+    return 1 / (1 + np.power(10, -scaling * scores / 400))
+
+
+def fit_scaling(scores: np.ndarray, results: np.ndarray, low=0.05, high=4.) -> float:
+    # Ternary search for the scaling constant that best maps the current scores to results
+    for _ in range(40):
+        a = low + (high - low) / 3
+        b = high - (high - low) / 3
+        if np.mean((results - win_probability(scores, a)) ** 2) < np.mean((results - win_probability(scores, b)) ** 2):
+            high = b
+        else:
+            low = a
+
+    return (low + high) / 2
+
+
+def tune(vector: np.ndarray, indices: np.ndarray, signs: np.ndarray, results: np.ndarray, scaling: float,
+         epochs=50, learning_rate=1., batch_size=16384, seed=0) -> np.ndarray:
+    """
+
+    Fits the weights to the game results with mini-batch Adam on the mean squared error of the predicted win
+    probability. Each batch is a gather, a row sum and a bincount, with no Python loop over positions.
+
+    :return: The tuned weight vector
+    """
+
+    vector = vector.astype(np.float32).copy()
+    first_moment = np.zeros_like(vector)
+    second_moment = np.zeros_like(vector)
+    frozen = np.zeros_like(vector, dtype=bool)
+    frozen[[king_value, padding]] = True
+
+    rng = np.random.default_rng(seed)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    derivative_scale = scaling * log(10) / 400
+    step = 0
+
+    for epoch in range(epochs):
+        order = rng.permutation(len(indices))
+
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            batch_indices = indices[batch]
+            batch_signs = signs[batch]
+
+            probability = win_probability((vector[batch_indices] * batch_signs).sum(axis=1), scaling)
+            score_gradient = -2 * (results[batch] - probability) * probability * (1 - probability) * derivative_scale
+
+            gradient = np.bincount(batch_indices.ravel(), (score_gradient[:, None] * batch_signs).ravel(),
+                                   minlength=len(vector)).astype(np.float32) / len(batch)
+            gradient[frozen] = 0
+
+            step += 1
+            first_moment = beta1 * first_moment + (1 - beta1) * gradient
+            second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+            corrected_first = first_moment / (1 - beta1 ** step)
+            corrected_second = second_moment / (1 - beta2 ** step)
+            vector -= learning_rate * corrected_first / (np.sqrt(corrected_second) + epsilon)
+
+        scores = evaluate_all(vector, indices, signs)
+        loss = np.mean((results - win_probability(scores, scaling)) ** 2)
+        print(f"Epoch {epoch + 1}/{epochs}: loss {loss:.6f}")
+
+    return vector
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tunes the evaluation weights to the results of logged games")
+    parser.add_argument("logs", nargs="+", help="Game log files or directories")
+    parser.add_argument("--output", default=None,
+                        help="Weights file to write, weights.json in the project root by default, which the game loads")
+    parser.add_argument("--initial", default=None, help="Weights file to start from instead of the defaults")
+    parser.add_argument("--features", default=None, help="Cache of the replayed positions (.npz)")
+    parser.add_argument("--skip-plies", type=int, default=8)
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--learning-rate", type=float, default=1.)
+    parser.add_argument("--batch-size", type=int, default=16384)
+    parser.add_argument("--scaling", type=float, default=None, help="Fitted from the initial weights if not given")
+    args = parser.parse_args()
+
+    # Paths on the command line are relative to where the tuner is run, while Weights resolves them from the root
+    if args.initial is not None:
+        if not os.path.isfile(args.initial):
+            parser.error(f"--initial {args.initial} does not exist")
+        args.initial = os.path.abspath(args.initial)
+    output = os.path.abspath(args.output) if args.output is not None else "weights.json"
+
+    start_time = time.time()
+    if args.features is not None and os.path.exists(args.features):
+        data = np.load(args.features)
+        indices, signs, results = data["indices"], data["signs"], data["results"]
+    else:
+        indices, signs, results = load_positions(args.logs, args.skip_plies)
+        if args.features is not None:
+            np.savez(args.features, indices=indices, signs=signs, results=results)
+
+    print(f"Loaded {len(indices)} positions in {time.time() - start_time:.1f}s")
+
+    vector = weights_to_vector(Weights(args.initial))
+
+    scaling = args.scaling
+    if scaling is None:
+        scaling = fit_scaling(evaluate_all(vector, indices, signs), results)
+        print(f"Scaling constant: {scaling:.4f}")
+
+    vector = tune(vector, indices, signs, results, scaling, args.epochs, args.learning_rate, args.batch_size)
+
+    weights = vector_to_weights(vector, Weights())
+    weights.file_path = output
+    weights.save_weights()
+    print(f"Saved weights to {os.path.join(weights.root_dir, output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Line based engine protocol over stdin/stdout, modelled on UCI. Moves use the ICCF notation of
+Board.get_iccf_notation. Nothing here imports pygame, so the rules and search can be driven as a subprocess.
+Malformed commands are answered with an info string and otherwise ignored.
+
+    uci                                      -> id lines, uciok
+    isready                                  -> readyok
+    ucinewgame                               clears the transposition table
+    setoption name Weights value <file>      loads evaluation weights
+    setoption name Hash value <entries>      sets the transposition table size
+    position startpos [moves <iccf> ...]     sets the position
+    go [depth N] [nodes N] [movetime MS] [infinite]
+                                             -> info lines, bestmove <iccf>
+    go perft N                               -> move counts per root move, nodes
+    stop                                     stops the current search
+    d                                        prints the position
+    quit
+"""
+
+import os
+import sys
+import threading
+import evaluation
+from engine import Search, mate_score
+from rules import starting_position, move_from_iccf, move_to_iccf, CELLS, PIECE_NAMES
+
+
+class Protocol:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.search = Search()
+        self.position = starting_position()
+        self.search_thread: threading.Thread | None = None
+
+    def send(self, line: str):
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def handle(self, line: str) -> bool:
+        """
+
+        Handles one command
+
+        :param line: The command line
+        :return: False once the engine should quit
+        """
+
+        tokens = line.split()
+        if not tokens:
+            return True
+
+        match tokens[0]:
+            case "uci":
+                self.send("id name HexagonalChess")
+                self.send("id author HexagonalChess")
+                self.send("option name Hash type spin default 1048576 min 1024 max 67108864")
+                self.send("option name Weights type string default weights.json")
+                self.send("uciok")
+            case "isready":
+                self.send("readyok")
+            case "ucinewgame":
+                self.wait_for_search()
+                self.search.clear()
+            case "setoption":
+                self.wait_for_search()
+                self.set_option(tokens)
+            case "position":
+                self.wait_for_search()
+                self.set_position(tokens)
+            case "go":
+                self.wait_for_search()
+                self.go(tokens)
+            case "stop":
+                self.search.stop()
+                self.wait_for_search()
+            case "d":
+                self.wait_for_search()
+                self.display()
+            case "quit":
+                self.search.stop()
+                self.wait_for_search()
+                return False
+            case _:
+                self.send(f"info string unknown command {tokens[0]}")
+
+        return True
+
+    def wait_for_search(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def set_option(self, tokens: list[str]):
+        if "name" not in tokens or "value" not in tokens:
+            return
+
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")]).lower()
+        value = " ".join(tokens[tokens.index("value") + 1:])
+
+        match name:
+            case "hash":
+                if not value.isdigit() or not 1024 <= int(value) <= 67108864:
+                    self.send(f"info string invalid hash size {value}")
+                    return
+
+                self.search.table_size = int(value)
+                self.search.clear()
+            case "weights":
+                # Relative to where the engine was started, not the project root Weights resolves from
+                if not os.path.isfile(value):
+                    self.send(f"info string weights file {value} not found")
+                    return
+
+                try:
+                    evaluation.load_weights(os.path.abspath(value))
+                except ValueError:
+                    self.send(f"info string invalid weights file {value}")
+                    return
+                self.search.clear()
+            case _:
+                self.send(f"info string unknown option {name}")
+
+    def set_position(self, tokens: list[str]):
+        if len(tokens) < 2 or tokens[1] != "startpos":
+            self.send("info string only position startpos is supported")
+            return
+
+        position = starting_position()
+
+        if "moves" in tokens:
+            for notation in tokens[tokens.index("moves") + 1:]:
+                try:
+                    move = move_from_iccf(notation) if len(notation) in (8, 9) else None
+                except (ValueError, KeyError):
+                    move = None
+
+                if move is None:
+                    self.send(f"info string invalid move {notation}")
+                    break
+                if move not in position.legal_moves():
+                    self.send(f"info string illegal move {notation}")
+                    break
+                position.apply(move)
+
+        self.position = position
+
+    def go(self, tokens: list[str]):
+        limits = {}
+        for name in ("depth", "nodes", "movetime", "perft"):
+            if name in tokens:
+                index = tokens.index(name) + 1
+                if index >= len(tokens) or not tokens[index].isdigit():
+                    self.send(f"info string {name} needs a number")
+                    return
+
+                limits[name] = int(tokens[index])
+
+        if "perft" in limits:
+            self.divide(limits["perft"])
+            return
+
+        if not limits and "infinite" not in tokens:
+            limits["depth"] = 4
+
+        position = self.position.copy()
+        # Cleared here rather than on the search thread, where it would overwrite a stop that arrives as it starts
+        self.search.stopped = False
+        self.search_thread = threading.Thread(target=self.run_search, args=(position, limits), daemon=True)
+        self.search_thread.start()
+
+    def run_search(self, position, limits: dict):
+        move, _ = self.search.search(position, limits.get("depth"), limits.get("nodes"), limits.get("movetime"),
+                                     self.send_info)
+        self.send(f"bestmove {move_to_iccf(move) if move is not None else '0000'}")
+
+    def send_info(self, info: dict):
+        score = info["score"]
+        if abs(score) >= mate_score - 1000:
+            plies = mate_score - abs(score)
+            score_text = f"mate {(plies + 1) // 2 if score > 0 else -(plies // 2)}"
+        else:
+            score_text = f"cp {score}"
+
+        self.send(f"info depth {info['depth']} score {score_text} nodes {info['nodes']} nps {info['nps']} "
+                  f"time {info['time']} pv {' '.join(info['pv'])}")
+
+    def divide(self, depth: int):
+        total = 0
+        for move in self.position.legal_moves():
+            child = self.position.copy()
+            child.apply(move)
+            count = perft(child, depth - 1)
+            total += count
+            self.send(f"{move_to_iccf(move)}: {count}")
+
+        self.send(f"nodes {total}")
+
+    def display(self):
+        for cell, code in enumerate(self.position.cells):
+            if code:
+                self.send(f"{CELLS[cell]} {'white' if code >> 3 else 'black'} {PIECE_NAMES[code & 7]}")
+
+        self.send(f"turn {'white' if self.position.turn else 'black'}")
+        self.send(f"key {self.position.key:016x}")
+
+
+def perft(position, depth: int) -> int:
+    if depth <= 0:
+        return 1
+
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    total = 0
+    for move in moves:
+        child = position.copy()
+        child.apply(move)
+        total += perft(child, depth - 1)
+
+    return total
+
+
+def main() -> None:
+    evaluation.load_weights()
+    protocol = Protocol()
+
+    for line in sys.stdin:
+        if not protocol.handle(line):
+            break
+
+    protocol.wait_for_search()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,60 +1,182 @@
 import os
 import pygame
 import pickle
-from PIL import Image
-from math import cos, sin, pi, sqrt
+import struct
+from math import cos, sin, pi, sqrt, floor, ceil
+from axial import position_to_file_and_rank
+from profiler import count
+
+
+piece_map = {
+    "bishop": 0,
+    "king": 1,
+    "knight": 2,
+    "pawn": 3,
+    "queen": 4,
+    "rook": 5
+}
+
+# Header of a sprite bundle: magic, sprite size in pixels
+bundle_header = struct.Struct("<4sH")
+bundle_magic = b"HXSB"
+images_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+sprite_sheet: pygame.Surface | None = None
+sprite_cache: dict[(int, str, float), pygame.Surface] = {}
+missing_bundles: set[int] = set()
 
 
 # noinspection PyTypeChecker
+def get_sprite_sheet() -> pygame.Surface:
+    """
+
+    Gets the piece sprite sheet, decoding it the first time it is needed
+
+    :return: The sprite sheet, with one row per color and one column per piece
+    """
+
+    global sprite_sheet
+
+    if sprite_sheet is None:
+        sprite_sheet = pygame.image.load(os.path.join(images_dir, "pieces.png")).convert_alpha()
+
+    return sprite_sheet
+
+
+def sprite_size(sprite_scale: float) -> int:
+    return int(100 * sprite_scale)
+
+
+def bundle_path(size: int) -> str:
+    return os.path.join(images_dir, f"pieces_{size}.bin")
+
+
+def load_sprite_bundle(sprite_scale: float) -> bool:
+    """
+
+    Loads every sprite at a scale from its pre-scaled bundle, which is a raw RGBA copy of the sprite sheet at that
+    size, so it takes one read and no decoding or scaling
+
+    :param sprite_scale: The scale of the sprites
+    :return: If there was a bundle for the scale
+    """
+
+    size = sprite_size(sprite_scale)
+    if size in missing_bundles:
+        return False
+
+    try:
+        with open(bundle_path(size), 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        missing_bundles.add(size)
+        return False
+
+    magic, bundle_size = bundle_header.unpack_from(data)
+    if magic != bundle_magic or bundle_size != size:
+        raise Exception(f"Invalid sprite bundle {bundle_path(size)}")
+
+    count("image_loads")
+
+    sheet = pygame.image.frombytes(data[bundle_header.size:], (size * len(piece_map), size * 2), "RGBA")
+    sheet = sheet.convert_alpha()
+
+    for piece, column in piece_map.items():
+        for color in range(2):
+            sprite_cache[(color, piece, sprite_scale)] = sheet.subsurface((column * size, color * size, size, size))
+
+    return True
+
+
+def save_sprite_bundle(sprite_scale: float):
+    # Scaled the same way as get_piece_image, so bundled sprites are identical to the ones made at runtime
+    size = sprite_size(sprite_scale)
+    sheet = pygame.Surface((size * len(piece_map), size * 2), pygame.SRCALPHA)
+
+    for piece, column in piece_map.items():
+        for color in range(2):
+            sprite = get_sprite_sheet().subsurface((column * 100, color * 100, 100, 100))
+            sheet.blit(pygame.transform.scale(sprite, (100 * sprite_scale, 100 * sprite_scale)),
+                       (column * size, color * size))
+
+    with open(bundle_path(size), 'wb') as file:
+        file.write(bundle_header.pack(bundle_magic, size))
+        file.write(pygame.image.tobytes(sheet, "RGBA"))
+
+
 def get_piece_image(color: int, piece: str, sprite_scale=1.0):
     """
 
-    Gets the image for the specified piece
+    Gets the image for the specified piece. Images are cached per color, piece and scale, and every piece with the
+    same key shares the same surface, so they must not be drawn on.
 
     :param color: The color of the piece. 0 for black, 1 for white.
     :param piece: The piece to be chosen
     :param sprite_scale: The scale of the image. Defaults to 1.
     :return: The sprite for the piece
     """
-    piece_map = {
-        "bishop": 0,
-        "king": 1,
-        "knight": 2,
-        "pawn": 3,
-        "queen": 4,
-        "rook": 5
-    }
+
+    key = (color, piece, sprite_scale)
+    image = sprite_cache.get(key)
+    if image is not None:
+        return image
 
     row = piece_map.get(piece)
     if row is None:
         raise Exception("Piece not defined")
 
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    pieces = Image.open(root_dir + '/images/pieces.png')
+    if load_sprite_bundle(sprite_scale):
+        return sprite_cache[key]
 
     sprite_x = row * 100
     sprite_y = color * 100
 
-    sprite = pieces.crop((sprite_x, sprite_y, sprite_x + 100, sprite_y + 100))
+    sprite = get_sprite_sheet().subsurface((sprite_x, sprite_y, 100, 100))
+    count("image_loads")
 
-    image = pygame.image.fromstring(sprite.tobytes(), sprite.size, sprite.mode).convert_alpha()
-
-    size = image.get_size()
-    size = (size[0] * sprite_scale, size[1] * sprite_scale)
-    image = pygame.transform.scale(image, size)
+    size = (100 * sprite_scale, 100 * sprite_scale)
+    image = pygame.transform.scale(sprite, size)
 
+    sprite_cache[key] = image
     return image
 
 
-def draw_regular_polygon(surface: pygame.Surface, color: pygame.Color, vertex_count: int, radius: float,
-                         position: (float, float), polygon_width=0):
+def rebuild_sprite_cache(sprite_scale: float):
+    """
+
+    Drops the cached sprites and builds every sprite at the new scale, for when the window size changes
+
+    :param sprite_scale: The new scale of the sprites
+    """
+
+    sprite_cache.clear()
+
+    for color in range(2):
+        for piece in piece_map:
+            get_piece_image(color, piece, sprite_scale)
+
+
+def regular_polygon_vertices(vertex_count: int, radius: float, position: (float, float)) -> list[(float, float)]:
     # from https://stackoverflow.com/a/57638991/12363073
     n, r = vertex_count, radius
     x, y = position
-    pygame.draw.polygon(surface, color, [
+    return [
         (x + r * cos(2 * pi * i / n), y + r * sin(2 * pi * i / n))
         for i in range(n)
-    ], polygon_width)
+    ]
+
+
+def bounding_rect(vertices: list[(float, float)]) -> pygame.Rect:
+    left = floor(min(x for x, _ in vertices))
+    top = floor(min(y for _, y in vertices))
+    right = ceil(max(x for x, _ in vertices))
+    bottom = ceil(max(y for _, y in vertices))
+    return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
+
+def draw_regular_polygon(surface: pygame.Surface, color: pygame.Color, vertex_count: int, radius: float,
+                         position: (float, float), polygon_width=0):
+    pygame.draw.polygon(surface, color, regular_polygon_vertices(vertex_count, radius, position), polygon_width)
 
 
 def position_to_cartesian(board, position: str) -> (float, float):
@@ -69,13 +191,6 @@ def position_to_cartesian(board, position: str) -> (float, float):
     return x, y
 
 
-def position_to_file_and_rank(position: str) -> (int, int):
-    file = position[0]
-    file_index = ord(file) - 97
-    rank = int(position[1:])
-    return file_index, rank
-
-
 def clamp(value, add, maximum, minimum=0):
     if value + add > maximum:
         return maximum
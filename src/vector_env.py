@@ -0,0 +1,200 @@
+import numpy as np
+from multiprocessing import Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+from features import plane_count, action_count, encode_planes, encode_mask, action_to_move
+from rules import starting_position
+
+
+class GameSlots:
+    """
+
+    Steps a contiguous slice of the games, writing straight into the shared arrays
+
+    """
+
+    def __init__(self, arrays: dict, start: int, end: int, max_plies: int):
+        self.observations = arrays["observations"][start:end]
+        self.masks = arrays["masks"][start:end]
+        self.rewards = arrays["rewards"][start:end]
+        self.dones = arrays["dones"][start:end]
+        self.actions = arrays["actions"][start:end]
+        self.max_plies = max_plies
+        self.positions = [starting_position() for _ in range(end - start)]
+        self.legal_moves = [position.legal_moves() for position in self.positions]
+
+    def reset_game(self, i: int):
+        self.positions[i] = starting_position()
+        self.legal_moves[i] = self.positions[i].legal_moves()
+        encode_planes(self.positions[i], self.observations[i])
+        encode_mask(self.legal_moves[i], self.masks[i])
+
+    def reset(self):
+        for i in range(len(self.positions)):
+            self.reset_game(i)
+
+        self.rewards[:] = 0
+        self.dones[:] = 0
+
+    def step(self):
+        for i, position in enumerate(self.positions):
+            move = action_to_move(self.actions[i], self.legal_moves[i])
+
+            if move is None:  # Illegal actions lose the game
+                self.rewards[i] = -1
+                self.dones[i] = 1
+                self.reset_game(i)
+                continue
+
+            position.apply(move)
+            legal_moves = position.legal_moves()
+
+            if not legal_moves:
+                self.rewards[i] = 1 if position.in_check() else 0
+                self.dones[i] = 1
+            elif position.ply >= self.max_plies:
+                self.rewards[i] = 0
+                self.dones[i] = 1
+            else:
+                self.rewards[i] = 0
+                self.dones[i] = 0
+
+            if self.dones[i]:
+                self.reset_game(i)
+            else:
+                self.legal_moves[i] = legal_moves
+                encode_planes(position, self.observations[i])
+                encode_mask(legal_moves, self.masks[i])
+
+
+def shared_arrays(buffers: dict[str, SharedMemory], num_envs: int) -> dict[str, np.ndarray]:
+    return {
+        "observations": np.ndarray((num_envs, plane_count, 91), dtype=np.uint8, buffer=buffers["observations"].buf),
+        "masks": np.ndarray((num_envs, action_count), dtype=np.bool_, buffer=buffers["masks"].buf),
+        "rewards": np.ndarray((num_envs,), dtype=np.float32, buffer=buffers["rewards"].buf),
+        "dones": np.ndarray((num_envs,), dtype=np.bool_, buffer=buffers["dones"].buf),
+        "actions": np.ndarray((num_envs,), dtype=np.int32, buffer=buffers["actions"].buf)
+    }
+
+
+def buffer_sizes(num_envs: int) -> dict[str, int]:
+    return {
+        "observations": num_envs * plane_count * 91,
+        "masks": num_envs * action_count,
+        "rewards": num_envs * 4,
+        "dones": num_envs,
+        "actions": num_envs * 4
+    }
+
+
+def worker(connection, buffer_names: dict[str, str], num_envs: int, start: int, end: int, max_plies: int):
+    buffers = {name: SharedMemory(buffer_name) for name, buffer_name in buffer_names.items()}
+    slots = GameSlots(shared_arrays(buffers, num_envs), start, end, max_plies)
+
+    try:
+        while True:
+            command = connection.recv()
+            if command == "reset":
+                slots.reset()
+            elif command == "step":
+                slots.step()
+            elif command == "close":
+                break
+            connection.send(None)
+    finally:
+        del slots
+        for buffer in buffers.values():
+            buffer.close()
+        connection.close()
+
+
+class VectorEnv:
+    """
+
+    Steps num_envs self-play games in lockstep. The side to move in each game plays the given action, and rewards are
+    for the player who just moved: 1 for checkmate, 0 otherwise, and -1 for an illegal action. Finished games reset
+    automatically, so the returned observation is already the start of the next game.
+
+    Observations are (num_envs, plane_count, 91) uint8 and masks (num_envs, action_count) bool, both views of shared
+    memory that the workers write into. They are overwritten by the next step, so copy them if they need to be kept.
+
+    """
+
+    def __init__(self, num_envs: int, num_workers=1, max_plies=400):
+        self.num_envs = num_envs
+        self.num_workers = max(0, min(num_workers, num_envs))
+        self.buffers = {name: SharedMemory(create=True, size=size) for name, size in buffer_sizes(num_envs).items()}
+        self.arrays = shared_arrays(self.buffers, num_envs)
+        self.connections = []
+        self.processes = []
+        self.local_slots = None
+        self.closed = False
+
+        if self.num_workers == 0:
+            self.local_slots = GameSlots(self.arrays, 0, num_envs, max_plies)
+            return
+
+        buffer_names = {name: buffer.name for name, buffer in self.buffers.items()}
+        bounds = np.linspace(0, num_envs, self.num_workers + 1).astype(int)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            parent_connection, child_connection = Pipe()
+            process = Process(target=worker, daemon=True,
+                              args=(child_connection, buffer_names, num_envs, int(start), int(end), max_plies))
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def run(self, command: str):
+        if self.local_slots is not None:
+            getattr(self.local_slots, command)()
+            return
+
+        for connection in self.connections:
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self) -> (np.ndarray, np.ndarray):
+        """
+
+        :return: The observations and legal move masks
+        """
+
+        self.run("reset")
+        return self.arrays["observations"], self.arrays["masks"]
+
+    def step(self, actions: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        """
+
+        Plays one move in every game
+
+        :param actions: One action per game, source cell * 91 + destination cell
+        :return: The observations, rewards, dones and legal move masks
+        """
+
+        self.arrays["actions"][:] = actions
+        self.run("step")
+        return self.arrays["observations"], self.arrays["rewards"], self.arrays["dones"], self.arrays["masks"]
+
+    def close(self):
+        if self.closed:
+            return
+
+        for connection in self.connections:
+            connection.send("close")
+        for process in self.processes:
+            process.join()
+
+        self.local_slots = None
+        self.arrays = None
+        for buffer in self.buffers.values():
+            buffer.close()
+            buffer.unlink()
+
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
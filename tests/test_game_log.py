@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from game_log import parse_game
+
+
+def test_duplicated_promotion_is_merged():
+    moves, result = parse_game("['06050606', '07070605', '06100611', '061006111', '05100409'] 1-0")
+    assert moves == ['06050606', '07070605', '061006111', '05100409']
+    assert result == 1.
+
+
+def test_moves_are_kept():
+    moves, result = parse_game("['06050606', '07070605', '061006111']")
+    assert moves == ['06050606', '07070605', '061006111']
+    assert result is None
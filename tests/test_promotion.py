@@ -0,0 +1,73 @@
+import os
+import random
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import pygame
+import pytest
+from axial import position_to_axial
+from board import Board
+from rules import CELLS, PIECE_NAMES, starting_position, move_to_iccf
+from settings import Settings
+
+
+def game_before_promotion(color: int) -> (list[(int, int, int)], (int, int, int)):
+    # Random games until one reaches a position where the given color can promote
+    for seed in range(1000):
+        rng = random.Random(seed)
+        position = starting_position()
+        moves = []
+        while position.ply < 400:
+            legal_moves = position.legal_moves()
+            if not legal_moves:
+                break
+
+            promotions = [move for move in legal_moves if move[2] == 1]
+            if promotions and position.turn == color:
+                return moves, promotions[0]
+
+            move = rng.choice(legal_moves)
+            position.apply(move)
+            moves.append(move)
+
+    raise Exception("No game reached a promotion")
+
+
+def tile_at(board: Board, cell: int):
+    return board.tiles.get(position_to_axial(CELLS[cell]).to_string())
+
+
+@pytest.mark.parametrize("color", [1, 0])
+def test_promotion_through_gui(color, monkeypatch):
+    pygame.init()
+    settings = Settings("settings.pkl")
+    board = Board(pygame.display.set_mode(settings.dimensions), settings)
+    board.start_game()
+
+    moves, promotion = game_before_promotion(color)
+    board.load_state([move_to_iccf(move) for move in moves], trusted=True)
+
+    # Drag the pawn onto its last rank, then choose a queen
+    source, destination = tile_at(board, promotion[0]), tile_at(board, promotion[1])
+    board.mouse_button_down_handler(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=source.cartesian_coordinates,
+                                                       button=1))
+    monkeypatch.setattr(pygame.mouse, "get_pos", lambda: destination.cartesian_coordinates)
+    board.update_sprites()
+    board.mouse_button_up_handler(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=destination.cartesian_coordinates,
+                                                     button=1))
+    assert board.promotion_flag
+    board.key_pressed_handler(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_q))
+
+    assert board.state[-1] == move_to_iccf(promotion)
+    assert len(board.state) == len(board.timeline) == len(moves) + 1
+
+    position = board.timeline.position
+    assert position.turn == board.turn == 1 - color
+    for cell, code in enumerate(position.cells):
+        piece = tile_at(board, cell).piece
+        if code:
+            assert (piece.color, piece.name) == (code >> 3, PIECE_NAMES[code & 7])
+        else:
+            assert piece is None